@@ -0,0 +1,88 @@
+"""
+Search Caches - Python Version
+==============================
+Small bounded caches shared by the Python search engine.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+
+class LRUCache:
+    """
+    Bounded least-recently-used cache with hit/miss counters.
+
+    Bounded by entry count and, when sizeof is given, by the total size of the values
+    (max_bytes); the least recently used entries are evicted until both bounds hold.
+    Safe to share between threads (e.g. searches and a background reload clearing it).
+    """
+
+    def __init__(self, max_entries: int = 128, max_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0  # Total sizeof of held values (0 without sizeof)
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Cached value (marked most recently used) or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entries beyond the bounds."""
+        if self.max_entries <= 0:
+            return
+        size = self.sizeof(value) if self.sizeof is not None else None
+        if size is not None and self.max_bytes is not None and size > self.max_bytes:
+            return  # Would evict everything else and still not fit
+        with self._lock:
+            if size is not None:
+                self.bytes += size - self._sizes.get(key, 0)
+                self._sizes[key] = size
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self.bytes > self.max_bytes):
+                evicted, _ = self._entries.popitem(last=False)
+                self.bytes -= self._sizes.pop(evicted, 0)
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Iterate entries without touching recency or counters."""
+        with self._lock:
+            return iter(list(self._entries.items()))
+
+    def clear(self):
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and occupancy."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+        }
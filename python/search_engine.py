@@ -6,30 +6,379 @@ AI can execute this code directly to see results and validate logic before VBA c
 """
 
 import pandas as pd
+import numpy as np
 import re
-from typing import List, Dict, Any, Optional, Tuple
+import time
+import difflib
+import contextlib
+import os
+import sys
+import threading
+import weakref
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Any, IO, Optional, Tuple, Union, Iterable, Iterator
 import json
 from pathlib import Path
 
+try:
+    from rapidfuzz import fuzz, process  # Same dependency as data_cleanup.py
+except ImportError:
+    fuzz = process = None  # Fuzzy mode falls back to difflib
+
+from search_index import (SearchIndexes, EMPTY_POSITIONS, intersect_positions, union_positions, top_k,
+                          tokenize, parse_tag_query, compact_frame, bitmap_positions, diff_rows, hash_rows,
+                          TAG_COLUMN)
+from search_synonyms import SynonymTable, DEFAULT_SYNONYM_MAPPING
+from search_cache import LRUCache
+from search_trace import SearchTrace, Tracer
+from search_snapshot import load_snapshot, save_snapshot, file_signature, publish, attach
+
+# 'all' = every token must match (VBA PerformSearch), 'any' = explicit OR opt-in,
+# 'ranked' = rows matching any token ordered by BM25 relevance,
+# 'fuzzy' = like 'all' but each token also matches similarly spelled vocabulary terms
+MATCH_MODES = ('all', 'any', 'ranked', 'fuzzy')
+
+# Fuzzy mode defaults (engine.fuzzy_threshold / engine.fuzzy_time_budget)
+FUZZY_THRESHOLD = 80.0  # rapidfuzz ratio, 0-100
+FUZZY_TIME_BUDGET = 0.05  # seconds per query
+FUZZY_MAX_CANDIDATES = 64  # trigram shortlist size per token
+FUZZY_MIN_LENGTH = 4  # shorter tokens (and tokens with digits) only match exactly
+
+# Relevance multipliers for ranked mode: whole description equals the query / starts with it
+RANK_EXACT_BOOST = 1.0
+RANK_PREFIX_BOOST = 0.25
+
+# Memory budget of the search result cache (row positions, scores)
+RESULT_CACHE_BYTES = 32 * 1024 * 1024
+
+# Tag searches shorter than this are ignored (VBA TAG_SEARCH_MIN_LEN)
+TAG_SEARCH_MIN_LEN = 3
+
+
+class QueryTerm:
+    """One search token with its synonym alternatives and compiled word-boundary pattern."""
+    def __init__(self, token: str, alternatives: List[str], pattern: re.Pattern, cost: int):
+        self.token = token
+        self.alternatives = alternatives
+        self.pattern = pattern
+        self.cost = cost  # Estimated matching rows, from token frequencies
+
+
+class QueryPlan:
+    """Ordered evaluation plan for a description search (rarest term first)."""
+    def __init__(self, terms: List[QueryTerm], match_mode: str = 'all'):
+        self.tokens = [term.token for term in terms]  # As typed
+        self.terms = sorted(terms, key=lambda term: term.cost)
+        self.match_mode = match_mode
+        self.complete = True  # False when fuzzy expansion stopped at the time budget
+    
+    def combined_pattern(self) -> re.Pattern:
+        """Single alternation over all terms (used to confirm rows in OR mode)."""
+        return re.compile('|'.join(term.pattern.pattern for term in self.terms), re.IGNORECASE)
+    
+    def describe(self) -> List[Dict[str, Any]]:
+        """Plan summary in evaluation order."""
+        return [{'token': term.token, 'alternatives': term.alternatives, 'cost': term.cost} for term in self.terms]
+
+
+class SearchResult:
+    """
+    Lightweight search result: row positions into the indexed data plus a column projection.
+    
+    Rows are copied out of the table only when materialized with to_frame(), and only for
+    the requested slice and columns.
+    """
+    def __init__(self, indexes: SearchIndexes, positions: np.ndarray,
+                 columns: Optional[List[str]] = None, truncated: bool = False,
+                 scores: Optional[np.ndarray] = None, facet_counts: Optional[Dict] = None):
+        self.indexes = indexes  # Keeps the data these positions refer to alive
+        self.positions = positions
+        self.scores = scores  # Relevance per position (ranked mode only)
+        self.facet_counts = facet_counts  # Category -> System -> Object Type counts of all matches
+        available = list(indexes.data.columns)
+        if columns is None:
+            self.columns = available
+        else:
+            self.columns = [column for column in columns if column in available]
+            for column in columns:
+                if column not in available:
+                    print(f"Warning: Output column '{column}' not found")
+        self.truncated = truncated  # More rows matched than were kept
+    
+    def __len__(self) -> int:
+        return len(self.positions)
+    
+    def to_frame(self, start: int = 0, stop: Optional[int] = None) -> pd.DataFrame:
+        """Materialize rows [start:stop] of the result as a DataFrame."""
+        data = self.indexes.data
+        column_positions = [data.columns.get_loc(column) for column in self.columns]
+        frame = data.iloc[self.positions[start:stop], column_positions]
+        if self.scores is not None:
+            frame = frame.assign(relevance_score=self.scores[start:stop])
+        return frame
+    
+    def head(self, n: int = 5) -> pd.DataFrame:
+        """Materialize the first n rows."""
+        return self.to_frame(0, n)
+
+
+class SearchCursor:
+    """
+    Paginated view of a complete search: the query plan plus every matching position in order.
+    
+    The search runs once when the cursor is opened; pages are materialized on demand, so
+    walking a large result holds one page of rows at a time and any page can be fetched
+    directly. The cursor keeps the index set it was opened on, so pages stay consistent
+    even if the engine loads new data meanwhile.
+    """
+    def __init__(self, result: 'SearchResult', plan: Optional['QueryPlan'], page_size: int = 100):
+        if page_size <= 0:
+            raise ValueError("page_size must be positive")
+        self.result = result
+        self.plan = plan  # None when there was no description search
+        self.page_size = page_size
+    
+    @property
+    def positions(self) -> np.ndarray:
+        """Matching row positions in output order."""
+        return self.result.positions
+    
+    def __len__(self) -> int:
+        return len(self.result)
+    
+    @property
+    def page_count(self) -> int:
+        return -(-len(self.result) // self.page_size)
+    
+    def page(self, number: int) -> pd.DataFrame:
+        """Rows of page number (0-based); empty beyond the last page."""
+        if number < 0:
+            raise ValueError("page number must be >= 0")
+        start = number * self.page_size
+        return self.result.to_frame(start, start + self.page_size)
+    
+    def pages(self, start: int = 0) -> Iterator[pd.DataFrame]:
+        """Generate pages lazily from page start onwards."""
+        for number in range(start, self.page_count):
+            yield self.page(number)
+
+
+class BatchResult:
+    """Results of search_many, keyed by each query's position in the input."""
+    def __init__(self, results: Dict[int, 'SearchResult'], unique: int, elapsed: float):
+        self.results = results
+        self.unique = unique  # Distinct queries actually executed
+        self.elapsed = elapsed  # Seconds for the whole batch
+    
+    def __len__(self) -> int:
+        return len(self.results)
+    
+    def __getitem__(self, position: int) -> 'SearchResult':
+        return self.results[position]
+    
+    def items(self):
+        return self.results.items()
+    
+    @property
+    def throughput(self) -> float:
+        """Queries per second over the whole batch."""
+        return len(self.results) / self.elapsed if self.elapsed > 0 else float('inf')
+
+
 class EquipmentSearchEngine:
-    def __init__(self, data_file: Optional[str] = None, config_file: Optional[str] = None):
-        """Initialize the search engine with data and configuration."""
+    def __init__(self, data_file: Optional[str] = None, config_file: Optional[str] = None,
+                 mapping_file: Optional[str] = None, plan_cache_size: int = 128,
+                 result_cache_bytes: int = RESULT_CACHE_BYTES):
+        """Initialize the search engine with data, configuration and synonym mapping."""
+        self.plan_cache = LRUCache(plan_cache_size)  # Compiled QueryPlans, see plan_query
+        self.refine_cache = LRUCache(32)  # Full match sets of recent typeahead queries
+        # Finished searches (positions, not frames), see search
+        self.result_cache = LRUCache(4096, result_cache_bytes, _result_bytes)
+        self.fuzzy_threshold = FUZZY_THRESHOLD
+        self.fuzzy_time_budget = FUZZY_TIME_BUDGET
+        # Tag search code sets (VBA CodeSet); None = codes seen in the loaded Tag IDs
+        self.tag_sys_codes: Optional[set] = None
+        self.tag_obj_codes: Optional[set] = None
+        self._published: Optional[Tuple[int, str]] = None  # (data version, file) from publish_indexes
+        self._reloader: Optional[ThreadPoolExecutor] = None  # Background reload thread, see reload
+        self.data_file: Optional[str] = None  # File loaded last (default for reload)
+        self.tracer: Optional[Tracer] = None  # Per-query stage traces, see enable_tracing
         self.data = pd.DataFrame()
         self.config = {}
-        self.mapping = {}  # Synonym mapping
+        self.synonyms = SynonymTable.from_rows(DEFAULT_SYNONYM_MAPPING)  # Synonym mapping
         
         if data_file:
             self.load_data(data_file)
         if config_file:
             self.load_config(config_file)
+        if mapping_file:
+            self.load_mapping(mapping_file)
     
-    def load_data(self, file_path: str):
-        """Load equipment data from CSV file."""
+    @property
+    def data(self) -> pd.DataFrame:
+        """Loaded equipment data (assigning a new frame rebuilds the search indexes)."""
+        return self._indexes.data
+
+    @data.setter
+    def data(self, frame: pd.DataFrame):
+        self._set_indexes(SearchIndexes(frame))
+
+    def _set_indexes(self, indexes: SearchIndexes):
+        """
+        Switch to a new index set; cached plans and match sets belong to the old data.
+        
+        The switch is a single reference assignment: every search takes self._indexes once,
+        so it runs entirely against either the old or the new generation.
+        """
+        self._indexes = indexes
+        self.plan_cache.clear()
+        self.refine_cache.clear()
+        self.result_cache.clear()
+
+    def _read_indexes(self, file_path: str, use_snapshot: bool,
+                      compact: bool) -> Tuple[SearchIndexes, Optional[Dict[str, Any]]]:
+        """
+        New index generation for file_path, built without touching the engine's state.
+        
+        Returns:
+            (indexes, signature): signature is the source file_signature to write a snapshot
+            with, or None when the indexes were mapped from a current snapshot (or snapshots
+            are off) and there is nothing to save
+        """
+        indexes = None
+        if use_snapshot:
+            try:
+                indexes = load_snapshot(file_path, options={'compact': compact})
+            except Exception as e:
+                print(f"Warning: could not read snapshot ({e}) - rebuilding it")
+        if indexes is not None:
+            return indexes, None
+        signature = file_signature(file_path) if use_snapshot else None
+        data = pd.read_csv(file_path)
+        report = None
+        if compact:
+            data, report = compact_frame(data)
+        indexes = SearchIndexes(data)
+        indexes.memory_report = report
+        return indexes, signature
+
+    def _save_snapshot(self, indexes: SearchIndexes, file_path: str, signature: Dict[str, Any], compact: bool):
+        try:
+            save_snapshot(indexes, file_path, signature=signature, options={'compact': compact})
+        except Exception as e:
+            print(f"Warning: could not write snapshot: {e}")
+
+    def load_data(self, file_path: str, use_snapshot: bool = True, compact: bool = True):
+        """
+        Load equipment data from CSV file.
+        
+        With use_snapshot, a current <file>.snapshot (see search_snapshot) is memory-mapped
+        instead of parsing the CSV and rebuilding the indexes; a missing or stale snapshot
+        is rebuilt after loading. With compact, low-cardinality text columns are stored as
+        categoricals (see memory_report).
+        """
         try:
-            self.data = pd.read_csv(file_path)
-            print(f"Loaded {len(self.data)} equipment records")
+            indexes, signature = self._read_indexes(file_path, use_snapshot, compact)
         except Exception as e:
             print(f"Error loading data: {e}")
+            return
+        self._set_indexes(indexes)
+        self.data_file = file_path
+        mapped = use_snapshot and signature is None
+        print(f"Loaded {len(self.data)} equipment records{' (snapshot)' if mapped else ''}")
+        if signature is not None:
+            self._save_snapshot(indexes, file_path, signature, compact)
+    
+    def reload(self, file_path: Optional[str] = None, use_snapshot: bool = True, compact: bool = True,
+               background: bool = False) -> Union[SearchIndexes, Future]:
+        """
+        Load a new generation of the data and indexes, then swap it in atomically (RCU style).
+        
+        The new generation is built aside while searches keep running against the current
+        one, then published with one reference assignment (see _set_indexes). Searches, and
+        SearchResults / cursors, that started on the old generation finish against it and
+        keep it alive; it is released (with its publish_indexes file) once none refer to it.
+        If reading fails, the current generation stays in place and the error is raised.
+        
+        Args:
+            file_path: Data file (default: the file loaded last)
+            use_snapshot, compact: As in load_data
+            background: Build on a background thread (one reload at a time) and return a
+                Future of the new indexes instead of waiting
+        
+        Returns:
+            The new SearchIndexes (or a Future of them with background)
+        """
+        file_path = file_path or self.data_file
+        if not file_path:
+            raise ValueError("No data file to reload")
+        if background:
+            if self._reloader is None:
+                self._reloader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='search-reload')
+            return self._reloader.submit(self.reload, file_path, use_snapshot, compact)
+        
+        start = time.perf_counter()
+        indexes, signature = self._read_indexes(file_path, use_snapshot, compact)
+        previous = self._indexes
+        self._set_indexes(indexes)
+        self.data_file = file_path
+        print(f"Reloaded {indexes.row_count} equipment records in {time.perf_counter() - start:.2f}s "
+              f"(data version {previous.version} -> {indexes.version})")
+        if signature is not None:
+            self._save_snapshot(indexes, file_path, signature, compact)
+        return indexes
+    
+    def apply_delta(self, file_path: str, key_column: str = 'SAP Equipment ID', use_snapshot: bool = True,
+                    compact: bool = True) -> Dict[str, Any]:
+        """
+        Ingest a new full extract incrementally, keyed by key_column.
+        
+        Rows are matched by key and compared by content hash; only inserted and updated rows
+        are tokenized and parsed (see SearchIndexes.apply_delta). The new generation is swapped
+        in like reload(), so running searches finish against the current one. When the extract
+        cannot be matched by key (different columns, blank or duplicate keys) it is loaded in
+        full instead.
+        
+        Returns:
+            {'inserted', 'updated', 'deleted', 'unchanged', 'seconds', 'incremental'}
+        """
+        start = time.perf_counter()
+        current = self._indexes
+        signature = file_signature(file_path) if use_snapshot else None
+        incoming = pd.read_csv(file_path)
+        hashes = hash_rows(incoming)
+        try:
+            delta, order, counts = diff_rows(current.data, incoming, key_column, current.row_hashes(), hashes)
+        except ValueError as e:
+            print(f"Warning: delta not applicable ({e}) - loading {file_path} in full")
+            delta, order = None, np.arange(len(incoming))
+            counts = {'inserted': len(incoming), 'updated': 0, 'deleted': current.row_count, 'unchanged': 0}
+        
+        data = incoming.iloc[order].reset_index(drop=True)
+        if delta is not None:
+            # Keep the current column layout instead of re-deciding (and re-measuring) compaction
+            if compact:
+                categorical = [column for column, dtype in current.data.dtypes.items()
+                               if isinstance(dtype, pd.CategoricalDtype)]
+                data = data.astype(dict.fromkeys(categorical, 'category'))
+            indexes = current.apply_delta(data, delta)
+        else:
+            report = None
+            if compact:
+                data, report = compact_frame(data)
+            indexes = SearchIndexes(data)
+            indexes.memory_report = report
+        indexes._row_hashes = hashes[order]
+        self._set_indexes(indexes)
+        self.data_file = file_path
+        
+        counts['seconds'] = time.perf_counter() - start
+        counts['incremental'] = delta is not None
+        print(f"Applied delta: {counts['inserted']} inserted, {counts['updated']} updated, "
+              f"{counts['deleted']} deleted ({counts['unchanged']} unchanged) in {counts['seconds']:.2f}s")
+        if signature is not None:
+            self._save_snapshot(indexes, file_path, signature, compact)
+        return counts
     
     def load_config(self, file_path: str):
         """Load configuration from JSON file."""
@@ -40,58 +389,488 @@ class EquipmentSearchEngine:
         except Exception as e:
             print(f"Error loading config: {e}")
     
+    def load_mapping(self, file_path: str):
+        """Load the synonym mapping table (tbl_Mapping export) from CSV or JSON."""
+        try:
+            self.synonyms = SynonymTable.from_file(file_path)
+            self.plan_cache.clear()
+            self.refine_cache.clear()
+            self.result_cache.clear()
+            print(f"Loaded {len(self.synonyms)} synonym terms")
+        except Exception as e:
+            print(f"Error loading mapping: {e}")
+    
     def build_synonym_index(self, mapping_data: List[Dict[str, str]]) -> Dict[str, List[str]]:
         """Build synonym index from mapping data (equivalent to VBA BuildSynonymIndex)."""
-        synonym_index = {}
+        synonym_index: Dict[str, Dict[str, None]] = {}
         
         for mapping in mapping_data:
             raw_term = mapping.get('RawTerm', '').strip().lower()
             standard_term = mapping.get('StandardTerm', '').strip().lower()
             
             if raw_term and standard_term:
-                if standard_term not in synonym_index:
-                    synonym_index[standard_term] = []
-                if raw_term not in synonym_index[standard_term]:
-                    synonym_index[standard_term].append(raw_term)
+                # Dict keys act as an insertion-ordered set
+                synonym_index.setdefault(standard_term, {})[raw_term] = None
         
-        return synonym_index
+        return {standard_term: list(raw_terms) for standard_term, raw_terms in synonym_index.items()}
     
-    def build_search_regexes(self, search_text: str, synonym_index: Dict[str, List[str]]) -> List[re.Pattern]:
-        """Build regex patterns for search terms with synonym expansion."""
+    def expand_search_terms(self,
+                            search_text: str,
+                            synonym_index: Union[SynonymTable, Dict[str, List[str]], None] = None) -> List[Tuple[str, List[str]]]:
+        """
+        Split search text into tokens and expand each token with its synonyms.
+        
+        Uses the engine's synonym table unless a table or legacy {StandardTerm: [RawTerm]} index is given.
+        """
         if not search_text.strip():
             return []
         
-        # Split search text into tokens
+        if synonym_index is None:
+            synonyms = self.synonyms
+        elif isinstance(synonym_index, SynonymTable):
+            synonyms = synonym_index
+        else:
+            synonyms = SynonymTable.from_index(synonym_index)
+        
+        # Split search text into tokens; each expansion is one hash lookup
         tokens = [token.strip().lower() for token in search_text.split() if token.strip()]
-        regex_patterns = []
+        return [(token, synonyms.expand(token)) for token in tokens]
+    
+    def compile_search_term(self, token: str, alternatives: List[str]) -> Tuple[re.Pattern, List[str]]:
+        """Compile a word-boundary alternation pattern; returns the pattern and the alternatives it covers."""
+        pattern = r'\b(?:' + '|'.join(re.escape(alt) for alt in alternatives) + r')\b'
         
-        for token in tokens:
-            # Build alternation pattern with synonyms
-            alternatives = [re.escape(token)]
-            
-            # Add synonyms
-            for standard_term, synonyms in synonym_index.items():
-                if token in synonyms or token == standard_term:
-                    alternatives.extend([re.escape(syn) for syn in synonyms])
-                    alternatives.append(re.escape(standard_term))
+        try:
+            return re.compile(pattern, re.IGNORECASE), alternatives
+        except re.error as e:
+            print(f"Regex error for token '{token}': {e}")
+            # Fallback to simple word boundary search
+            return re.compile(r'\b' + re.escape(token) + r'\b', re.IGNORECASE), [token]
+    
+    def build_search_regexes(self,
+                             search_text: str,
+                             synonym_index: Union[SynonymTable, Dict[str, List[str]], None] = None) -> List[re.Pattern]:
+        """Build regex patterns for search terms with synonym expansion."""
+        return [
+            self.compile_search_term(token, alternatives)[0]
+            for token, alternatives in self.expand_search_terms(search_text, synonym_index)
+        ]
+    
+    def plan_query(self,
+                   description_search: str,
+                   match_mode: str = 'all',
+                   synonym_index: Union[SynonymTable, Dict[str, List[str]], None] = None,
+                   indexes: Optional[SearchIndexes] = None,
+                   trace: Optional[SearchTrace] = None) -> 'QueryPlan':
+        """
+        Parse a description search into a QueryPlan.
+        
+        Terms are costed from token posting-list lengths so the rarest term is evaluated first.
+        Plans are cached (LRU) by normalized query text, match mode, synonym table version and
+        data version; the cache is also cleared whenever data or the mapping is reloaded.
+        With a trace, the synonym, fuzzy, compile and costing stages are timed.
+        """
+        if match_mode not in MATCH_MODES:
+            raise ValueError(f"Match mode '{match_mode}' not found.")
+        indexes = indexes or self._indexes
+        
+        if synonym_index is None:
+            synonym_index = self.synonyms
+        cache_key = None
+        if isinstance(synonym_index, SynonymTable):
+            normalized = ' '.join(token.lower() for token in description_search.split())
+            cache_key = (normalized, match_mode, synonym_index.version, indexes.version)
+            if match_mode == 'fuzzy':
+                cache_key += (self.fuzzy_threshold,)
+            plan = self.plan_cache.get(cache_key)
+            if trace is not None:
+                trace.cache['plans'] = plan is not None
+            if plan is not None:
+                return plan
+        
+        deadline = None
+        if match_mode == 'fuzzy':
+            if indexes.tokens is not None:
+                indexes.tokens.trigrams  # Built on first use - not part of the scoring budget
+                if trace is not None:
+                    trace.mark('fuzzy_index')
+            deadline = time.monotonic() + self.fuzzy_time_budget
+        terms = []
+        expanded = self.expand_search_terms(description_search, synonym_index)
+        if trace is not None:
+            trace.mark('synonyms')
+        for token, alternatives in expanded:
+            if deadline is not None:
+                similar = self.fuzzy_terms(token, indexes=indexes, deadline=deadline)
+                alternatives = alternatives + [term for term in similar if term not in alternatives]
+                if trace is not None:
+                    trace.mark('fuzzy')
+            pattern, alternatives = self.compile_search_term(token, alternatives)
+            if trace is not None:
+                trace.mark('compile')
+            if indexes.tokens is not None:
+                cost = indexes.tokens.estimate(alternatives)
+            else:
+                cost = indexes.row_count
+            terms.append(QueryTerm(token, alternatives, pattern, cost))
+            if trace is not None:
+                trace.mark('costing')
+        
+        plan = QueryPlan(terms, match_mode)
+        if deadline is not None and time.monotonic() > deadline:
+            print(f"Fuzzy matching stopped at the {self.fuzzy_time_budget * 1000:.0f} ms time budget")
+            plan.complete = False
+            cache_key = None  # Incomplete expansion - don't reuse it (nor results found with it)
+        if cache_key is not None:
+            self.plan_cache.put(cache_key, plan)
+        return plan
+    
+    def fuzzy_terms(self,
+                    token: str,
+                    threshold: Optional[float] = None,
+                    indexes: Optional[SearchIndexes] = None,
+                    deadline: Optional[float] = None) -> List[str]:
+        """
+        Description vocabulary terms spelled similarly to token (e.g. 'resevoir' -> 'reservoir').
+        
+        A trigram index shortlists candidate terms; only those are scored with rapidfuzz
+        (difflib when rapidfuzz is not installed), so edit distance is never computed against
+        the whole vocabulary or the rows.
+        
+        Args:
+            token: Lowercase search token
+            threshold: Minimum similarity ratio 0-100 (default engine.fuzzy_threshold)
+            indexes: Index set to use (defaults to the current one)
+            deadline: time.monotonic() value after which scoring stops
             
-            # Remove duplicates and create word boundary pattern
-            unique_alternatives = list(set(alternatives))
-            pattern = r'\b(?:' + '|'.join(unique_alternatives) + r')\b'
+        Returns:
+            Matching terms, most similar first (the token itself excluded)
+        """
+        indexes = indexes or self._indexes
+        threshold = self.fuzzy_threshold if threshold is None else threshold
+        if (indexes.tokens is None or len(token) < FUZZY_MIN_LENGTH
+                or not token.isalpha() or (deadline is not None and time.monotonic() > deadline)):
+            return []
+        
+        candidates = [term for term in indexes.tokens.trigrams.shortlist(token, threshold, FUZZY_MAX_CANDIDATES)
+                      if term != token]
+        if deadline is not None and time.monotonic() > deadline:
+            return []
+        if process is not None:
+            matches = process.extract(token, candidates, scorer=fuzz.ratio, score_cutoff=threshold,
+                                      limit=None)
+            return [term for term, _, _ in matches]
+        
+        scored = []
+        for term in candidates:
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            score = difflib.SequenceMatcher(None, token, term).ratio() * 100
+            if score >= threshold:
+                scored.append((score, term))
+        return [term for _, term in sorted(scored, key=lambda item: -item[0])]
+    
+    def execute_plan(self,
+                     plan: 'QueryPlan',
+                     indexes: Optional[SearchIndexes] = None,
+                     candidates: Optional[np.ndarray] = None,
+                     limit: Optional[int] = None,
+                     ranks: Optional[np.ndarray] = None,
+                     memo: Optional[Dict] = None) -> np.ndarray:
+        """
+        Row positions whose description satisfies the plan.
+        
+        Args:
+            plan: Plan from plan_query
+            indexes: Index set to evaluate against (defaults to the current one)
+            candidates: Optional sorted row positions to restrict the search to
+            limit: Stop once this many rows are confirmed
+            ranks: Optional sort rank array; results (and the limit) then follow rank order
+            memo: Term resolutions to share between plans evaluated against the same indexes
+                (search_many keeps one per batch)
             
+        Returns:
+            Positions in ascending row order, or in rank order when ranks is given
+        """
+        indexes = indexes or self._indexes
+        if plan.match_mode == 'any':
+            return self._execute_any(plan, indexes, candidates, limit, ranks, memo)
+        
+        current = candidates
+        checks = []
+        for term in plan.terms:
+            sure, maybe = self._resolve_term(indexes, term, memo)
+            if maybe is None:
+                # Index can't narrow this term - every surviving row needs the regex
+                checks.append((term.pattern, None))
+                continue
+            rows = union_positions([sure, maybe])
+            current = rows if current is None else intersect_positions([current, rows])
+            if not len(current):
+                return EMPTY_POSITIONS
+            if len(maybe):
+                checks.append((term.pattern, sure))
+        
+        if current is None:
+            current = np.arange(indexes.row_count, dtype=np.int64)
+        return self._confirm_rows(indexes, current, checks, limit, ranks)
+    
+    def refine_plan(self,
+                    plan: 'QueryPlan',
+                    indexes: Optional[SearchIndexes] = None,
+                    candidates: Optional[np.ndarray] = None,
+                    scope: Tuple = ()) -> np.ndarray:
+        """
+        Evaluate an 'all' plan incrementally from recently cached match sets.
+        
+        Under AND semantics a query's rows are a subset of the rows of any query made of a
+        subset of its tokens. The largest cached token subset (same scope) is used as the
+        candidate set and only the remaining terms are evaluated. Typing another token filters
+        the previous result; backspacing reuses the cached shorter query. A partially typed
+        last token is never a refinement of its prefix (matching is whole-word), so it is
+        evaluated against the ancestor without that token.
+        
+        Args:
+            plan: Plan from plan_query (match_mode 'all')
+            indexes: Index set to evaluate against (defaults to the current one)
+            candidates: Sorted row positions already applied by the caller (e.g. valve filter)
+            scope: Anything else the candidates depend on; entries only match within a scope
+        """
+        indexes = indexes or self._indexes
+        scope = (scope, self.synonyms.version, indexes.version)
+        tokens = tuple(sorted(term.token for term in plan.terms))
+        
+        cached = self.refine_cache.get((scope, tokens))
+        if cached is not None:
+            return cached
+        
+        # Largest cached ancestor whose tokens are a sub-multiset of this query's tokens
+        ancestor_tokens, ancestor_rows = (), candidates
+        for (entry_scope, entry_tokens), entry_rows in self.refine_cache.items():
+            if entry_scope != scope or len(entry_tokens) <= len(ancestor_tokens):
+                continue
+            remaining = list(tokens)
             try:
-                regex_patterns.append(re.compile(pattern, re.IGNORECASE))
-            except re.error as e:
-                print(f"Regex error for token '{token}': {e}")
-                # Fallback to simple word boundary search
-                regex_patterns.append(re.compile(r'\b' + re.escape(token) + r'\b', re.IGNORECASE))
+                for token in entry_tokens:
+                    remaining.remove(token)
+            except ValueError:
+                continue
+            ancestor_tokens, ancestor_rows = entry_tokens, entry_rows
+        
+        remaining_terms = list(plan.terms)
+        for token in ancestor_tokens:
+            remaining_terms.remove(next(term for term in remaining_terms if term.token == token))
         
-        return regex_patterns
+        rows = self.execute_plan(QueryPlan(remaining_terms, 'all'), indexes, ancestor_rows)
+        self.refine_cache.put((scope, tokens), rows)
+        return rows
+    
+    def rank_plan(self,
+                  plan: 'QueryPlan',
+                  indexes: Optional[SearchIndexes] = None,
+                  candidates: Optional[np.ndarray] = None,
+                  limit: Optional[int] = None,
+                  ranks: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Relevance-ranked evaluation: BM25 scores from the token index statistics.
+        
+        Each query token scores a row with its best-matching synonym alternative; token scores
+        are summed. Rows whose description starts with the query's first word, or equals the
+        query, get multiplicative boosts. Scores accumulate in dense NumPy arrays and only the
+        top `limit` rows are sorted.
+        
+        Returns:
+            (positions, scores) in descending score order (ties follow ranks, then row order)
+        """
+        indexes = indexes or self._indexes
+        tokens = indexes.tokens
+        if tokens is None or not indexes.row_count:
+            return EMPTY_POSITIONS, np.zeros(0)
+        
+        scores = np.zeros(indexes.row_count)
+        for term in plan.terms:
+            term_scores = np.zeros(indexes.row_count)
+            for alt in term.alternatives:
+                words = tokenize(alt)
+                if not words:
+                    continue  # Punctuation only - no term statistics to score
+                if len(words) == 1 and words[0] == alt:
+                    rows = tokens.lookup(alt)
+                    freqs = tokens.freqs.get(alt, np.zeros(0, dtype=np.int32))
+                else:
+                    # Phrase: confirm candidate rows, count one occurrence each
+                    rows = intersect_positions([tokens.lookup(word) for word in words])
+                    pattern = re.compile(r'\b' + re.escape(alt) + r'\b', re.IGNORECASE)
+                    rows = self._confirm_rows(indexes, rows, [(pattern, None)], None)
+                    freqs = np.ones(len(rows), dtype=np.int32)
+                if len(rows):
+                    term_scores[rows] = np.maximum(term_scores[rows], tokens.bm25(rows, freqs))
+            scores += term_scores
+        
+        if candidates is not None:
+            allowed = np.zeros(indexes.row_count, dtype=bool)
+            allowed[candidates] = True
+            scores[~allowed] = 0.0
+        matched = np.flatnonzero(scores > 0)
+        
+        # Prefix / exact boosts
+        query_words = tokenize(' '.join(plan.tokens))
+        if query_words and len(matched):
+            prefix = tokens.first_tokens[matched] == query_words[0]
+            scores[matched[prefix]] *= 1.0 + RANK_PREFIX_BOOST
+            same_length = matched[tokens.doc_lengths[matched] == len(query_words)]
+            texts = indexes.descriptions
+            exact = [pos for pos in same_length.tolist() if tokenize(texts[pos]) == query_words]
+            scores[exact] *= 1.0 + RANK_EXACT_BOOST
+        
+        if limit is not None and len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]] if limit > 0 else EMPTY_POSITIONS
+        tie_break = ranks[matched] if ranks is not None else matched
+        matched = matched[np.lexsort((tie_break, -scores[matched]))]
+        return matched, scores[matched]
+    
+    def _execute_any(self, plan: 'QueryPlan', indexes: SearchIndexes, candidates: Optional[np.ndarray],
+                     limit: Optional[int], ranks: Optional[np.ndarray], memo: Optional[Dict] = None) -> np.ndarray:
+        """OR mode: rows matching at least one term."""
+        sure_parts, maybe_parts = [], []
+        for term in plan.terms:
+            sure, maybe = self._resolve_term(indexes, term, memo)
+            if maybe is None:
+                rows = candidates if candidates is not None else np.arange(indexes.row_count, dtype=np.int64)
+                return self._confirm_rows(indexes, rows, [(plan.combined_pattern(), None)], limit, ranks)
+            sure_parts.append(sure)
+            maybe_parts.append(maybe)
+        
+        sure = union_positions(sure_parts)
+        rows = union_positions([sure] + maybe_parts)
+        if candidates is not None:
+            sure = intersect_positions([sure, candidates])
+            rows = intersect_positions([rows, candidates])
+        if len(rows) == len(sure):
+            return self._confirm_rows(indexes, rows, [], limit, ranks)
+        return self._confirm_rows(indexes, rows, [(plan.combined_pattern(), sure)], limit, ranks)
+    
+    def _resolve_term(self, indexes: SearchIndexes, term: 'QueryTerm',
+                      memo: Optional[Dict] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """(sure, maybe) rows for a term; maybe is None when only a regex scan can answer it."""
+        if indexes.tokens is None:
+            return EMPTY_POSITIONS, None
+        if memo is None:
+            return indexes.tokens.resolve(term.alternatives)
+        key = tuple(term.alternatives)
+        resolved = memo.get(key)
+        if resolved is None:
+            resolved = memo[key] = indexes.tokens.resolve(term.alternatives)
+        return resolved
+    
+    def _confirm_rows(self, indexes: SearchIndexes, rows: np.ndarray,
+                      checks: List[Tuple[re.Pattern, Optional[np.ndarray]]],
+                      limit: Optional[int],
+                      ranks: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Apply the regex checks to candidate rows in output order, stopping at limit.
+        
+        Each check is (pattern, sure_rows); rows already in sure_rows skip that regex.
+        Output order is ascending row position, or rank order when ranks is given.
+        """
+        if ranks is not None:
+            if not checks:
+                return top_k(rows, limit if limit is not None else len(rows), ranks)
+            rows = rows[np.argsort(ranks[rows], kind='stable')]
+        elif not checks:
+            return rows[:limit]
+        
+        needs = [
+            [True] * len(rows) if sure is None else (~np.isin(rows, sure, assume_unique=True)).tolist()
+            for _, sure in checks
+        ]
+        patterns = [pattern for pattern, _ in checks]
+        texts = indexes.descriptions
+        kept = []
+        for i, pos in enumerate(rows.tolist()):
+            text = texts[pos]
+            for pattern, need in zip(patterns, needs):
+                if need[i] and not (isinstance(text, str) and pattern.search(text)):
+                    break
+            else:
+                kept.append(pos)
+                if limit is not None and len(kept) >= limit:
+                    break
+        return np.asarray(kept, dtype=np.int64)
+    
+    def facet_positions(self, facets: Dict[str, Union[str, List[str]]],
+                        indexes: Optional[SearchIndexes] = None) -> Optional[np.ndarray]:
+        """
+        Rows left visible by slicer-style facet filters (VBA VisibleRowIndexes).
+        
+        Each facet's selected values are ORed and the facets ANDed, on packed per-value
+        bitmaps; only the surviving positions are unpacked.
+        
+        Args:
+            facets: {column: value or list of values}; columns without a facet index are ignored
+            indexes: Index set to use (defaults to the current one)
+            
+        Returns:
+            Sorted row positions, or None when no facet applies
+        """
+        indexes = indexes or self._indexes
+        combined = None
+        for column, selected in facets.items():
+            facet = indexes.facets.get(column)
+            if facet is None:
+                print(f"Warning: Facet column '{column}' not found")
+                continue
+            if isinstance(selected, str):
+                selected = [selected]
+            bitmap = facet.bitmap(list(selected))
+            combined = bitmap if combined is None else combined & bitmap
+        if combined is None:
+            return None
+        return bitmap_positions(combined, indexes.row_count)
+    
+    @staticmethod
+    def _facet_key(facets: Optional[Dict[str, Union[str, List[str]]]]) -> Tuple:
+        """Hashable, order-independent form of a facet selection."""
+        if not facets:
+            return ()
+        return tuple(sorted(
+            (column, (selected,) if isinstance(selected, str) else tuple(sorted(selected)))
+            for column, selected in facets.items()
+        ))
+    
+    def parse_tag_query(self, tag_search: str,
+                        indexes: Optional[SearchIndexes] = None) -> Tuple[str, str, str]:
+        """(sys, obj, num) parts of a tag search - equivalent to VBA ParseTagQuery."""
+        indexes = indexes or self._indexes
+        tags = indexes.tags
+        sys_codes = self.tag_sys_codes if self.tag_sys_codes is not None else (tags.sys_codes if tags else set())
+        obj_codes = self.tag_obj_codes if self.tag_obj_codes is not None else (tags.obj_codes if tags else set())
+        return parse_tag_query(tag_search, {c.upper() for c in sys_codes}, {c.upper() for c in obj_codes})
+    
+    def tag_ranks(self, tag_search: str, indexes: Optional[SearchIndexes] = None) -> Optional[np.ndarray]:
+        """
+        Rank tier of every row for a tag search - equivalent to VBA TagMatchRank per row.
+        
+        Returns:
+            int8 array aligned with the data (0 best, 1, 2, -1 = no match), or None without a Tag ID column
+        """
+        indexes = indexes or self._indexes
+        if indexes.tags is None:
+            print(f"Warning: Tag column '{TAG_COLUMN}' not found")
+            return None
+        return indexes.tags.rank(*self.parse_tag_query(tag_search, indexes))
     
     def search_equipment(self, 
                         description_search: str = "", 
                         valve_search: str = "",
-                        max_results: int = 1000) -> pd.DataFrame:
+                        max_results: int = 1000,
+                        match_mode: str = 'all',
+                        incremental: bool = False,
+                        columns: Optional[List[str]] = None,
+                        sort_by: Optional[str] = 'Equipment Description',
+                        tag_search: str = "",
+                        facets: Optional[Dict[str, Union[str, List[str]]]] = None,
+                        facet_counts: bool = False) -> pd.DataFrame:
         """
         Main search function - equivalent to VBA PerformSearch.
         
@@ -99,61 +878,405 @@ class EquipmentSearchEngine:
             description_search: Description text to search for
             valve_search: Valve number to search for (exact match)
             max_results: Maximum number of results to return
+            match_mode: 'all' requires every token to match (VBA behavior), 'any' ORs them,
+                'ranked' returns rows matching any token by BM25 relevance (adds relevance_score),
+                'fuzzy' is 'all' with typo tolerance (see fuzzy_terms)
+            incremental: Refine from cached results of earlier queries (typeahead, see refine_plan)
+            columns: Output columns (default: all)
+            sort_by: Column to sort by (None keeps table order); max_results keeps the first rows in this order
+            tag_search: Tag ID query like 'FW PV 6102' (at least TAG_SEARCH_MIN_LEN characters);
+                keeps rows with a TagMatchRank tier >= 0, best tier first, then sort_by order
+            facets: Slicer-style filters, e.g. {'Work Area': 'Unit 1', 'Object Type': ['PUMP', 'FAN']};
+                values of one facet are ORed, facets are ANDed (see facet_positions)
+            facet_counts: Also count all matching rows per Category -> System -> Object Type
+                (in frame.attrs['facet_counts'], see FacetCube.counts)
             
         Returns:
             DataFrame with matching equipment records
         """
-        if self.data.empty:
+        trace = None
+        if self.tracer is not None:
+            trace = self._start_trace('search_equipment', description_search, valve_search, max_results, match_mode,
+                                      incremental, sort_by, tag_search, facets, facet_counts)
+        result = self._search(trace, description_search, valve_search, max_results, match_mode,
+                              incremental, columns, sort_by, tag_search, facets, facet_counts)
+        frame = result.to_frame()
+        if result.facet_counts is not None:
+            frame.attrs['facet_counts'] = result.facet_counts
+        if trace is not None:
+            trace.mark('materialize', len(result), len(frame))
+            self.tracer.finish(trace, len(frame))
+        return frame
+    
+    def search(self,
+               description_search: str = "",
+               valve_search: str = "",
+               max_results: int = 1000,
+               match_mode: str = 'all',
+               incremental: bool = False,
+               columns: Optional[List[str]] = None,
+               sort_by: Optional[str] = 'Equipment Description',
+               tag_search: str = "",
+               facets: Optional[Dict[str, Union[str, List[str]]]] = None,
+               facet_counts: bool = False) -> 'SearchResult':
+        """
+        Same search as search_equipment, returned as a SearchResult handle.
+        
+        The handle holds matching row positions (in output order) and the column projection;
+        no table data is copied until the caller materializes the rows it displays.
+        With facet_counts, every match is found (no early stop at max_results) and counted.
+        Finished searches are cached by query and data version (see result_cache_key).
+        """
+        trace = None
+        if self.tracer is not None:
+            trace = self._start_trace('search', description_search, valve_search, max_results, match_mode,
+                                      incremental, sort_by, tag_search, facets, facet_counts)
+        result = self._search(trace, description_search, valve_search, max_results, match_mode,
+                              incremental, columns, sort_by, tag_search, facets, facet_counts)
+        if trace is not None:
+            self.tracer.finish(trace, len(result))
+        return result
+    
+    def _search(self, trace: Optional[SearchTrace], description_search: str, valve_search: str,
+                max_results: int, match_mode: str, incremental: bool, columns: Optional[List[str]],
+                sort_by: Optional[str], tag_search: str, facets: Optional[Dict[str, Union[str, List[str]]]],
+                facet_counts: bool, indexes: Optional[SearchIndexes] = None,
+                memo: Optional[Dict] = None) -> 'SearchResult':
+        """
+        search() with an optional trace receiving each stage (see enable_tracing), against
+        the given indexes (default: the current ones) with an optional term memo (execute_plan).
+        """
+        indexes = indexes or self._indexes
+        valve_search = self._valve_query(valve_search)  # Matched, refined and cached by this form only
+        if trace is not None:
+            trace.data_version = indexes.version
+        if indexes.data.empty:
             print("No data loaded")
-            return pd.DataFrame()
+            return SearchResult(indexes, EMPTY_POSITIONS, columns)
+        
+        cache_key = self.result_cache_key(description_search, valve_search, max_results, match_mode,
+                                          sort_by, tag_search, facets, facet_counts, indexes)
+        cached = self.result_cache.get(cache_key)
+        if trace is not None:
+            trace.cache['results'] = cached is not None
+            trace.mark('result_cache')
+        if cached is not None:
+            positions, truncated, scores, counts = cached
+            if truncated:
+                print(f"Results limited to {max_results} records")
+            return SearchResult(indexes, positions, columns, truncated, scores, counts)
         
         # Start with all visible data (in VBA this would be filtered by slicers)
-        results = self.data.copy()
+        positions = self.facet_positions(facets, indexes) if facets else None
+        if trace is not None and facets:
+            trace.mark('facets', indexes.row_count, indexes.row_count if positions is None else len(positions))
+        scores = None
+        ordered = False  # positions already in output order
+        
+        # Sort by description (equivalent to VBA sorting) using the precomputed rank array
+        ranks = None
+        if sort_by:
+            ranks = indexes.sort.get(sort_by)
+            if ranks is None:
+                print(f"Warning: Sort column '{sort_by}' not found")
+            if trace is not None:
+                trace.mark('sort_ranks')
+        
+        # Apply valve number search first - the exact match is cheap and narrows the description check
+        if valve_search:
+            valve_column = 'Valve Number'  # Configurable
+            key_index = indexes.keys.get(valve_column)
+            rows_in = indexes.row_count if positions is None else len(positions)
+            if key_index is not None:
+                # Exact (case-insensitive) match for valve number, confirmed within the key bucket
+                bucket = key_index.lookup(valve_search)
+                positions = bucket[key_index.raw_lower[bucket] == valve_search]
+            else:
+                print(f"Warning: Valve column '{valve_column}' not found")
+            if trace is not None:
+                trace.mark('valve', rows_in, indexes.row_count if positions is None else len(positions))
+        
+        # Tag search: keep ranked rows, ordered by tier first (VBA MakeSortKey rank|sort text)
+        tag_active = len(tag_search.strip()) >= TAG_SEARCH_MIN_LEN
+        if tag_active:
+            rows_in = indexes.row_count if positions is None else len(positions)
+            if indexes.tags is not None:
+                matched, tiers = indexes.tags.matches(*self.parse_tag_query(tag_search, indexes))
+                positions = matched if positions is None else intersect_positions([positions, matched])
+                # Unmatched rows keep their plain rank; they are never candidates
+                within_tier = ranks if ranks is not None else np.arange(indexes.row_count)
+                tier_ranks = within_tier.astype(np.int64)
+                tier_ranks[matched] += tiers.astype(np.int64) * indexes.row_count
+                ranks = tier_ranks
+            else:
+                print(f"Warning: Tag column '{TAG_COLUMN}' not found")
+            if trace is not None:
+                trace.mark('tag', rows_in, indexes.row_count if positions is None else len(positions))
         
         # Apply description search if provided
+        plan = None
         if description_search.strip():
-            # Build synonym mapping (in real implementation, load from data)
-            sample_mapping = [
-                {"RawTerm": "pump", "StandardTerm": "pumping equipment"},
-                {"RawTerm": "motor", "StandardTerm": "electric motor"},
-                {"RawTerm": "valve", "StandardTerm": "control valve"}
-            ]
+            plan = self.plan_query(description_search, match_mode, indexes=indexes, trace=trace)
+            if trace is not None:
+                trace.plan = plan.describe()
             
-            synonym_index = self.build_synonym_index(sample_mapping)
-            regex_patterns = self.build_search_regexes(description_search, synonym_index)
-            
-            # Apply description filter
-            if regex_patterns:
-                description_column = 'Equipment Description'  # Configurable
-                if description_column in results.columns:
-                    mask = results[description_column].str.contains(
-                        '|'.join([pattern.pattern for pattern in regex_patterns]), 
-                        case=False, na=False, regex=True
-                    )
-                    results = results[mask]
+            # Apply description filter (rarest term first, stop once max_results rows are confirmed in sort order)
+            if plan.terms:
+                description_column = indexes.description_column  # Configurable
+                if description_column in indexes.data.columns:
+                    rows_in = indexes.row_count if positions is None else len(positions)
+                    refine_hits = self.refine_cache.hits
+                    limit = None if facet_counts else max_results + 1
+                    if match_mode == 'ranked':
+                        # Relevance order replaces the column sort
+                        positions, scores = self.rank_plan(plan, indexes, positions, limit, ranks)
+                        ordered = True
+                        strategy = 'rank'
+                    elif incremental and match_mode == 'all':
+                        # Exactly the valve text that filtered the candidates
+                        scope = (valve_search, tag_search.strip().upper() if tag_active else '',
+                                 self._facet_key(facets))
+                        positions = self.refine_plan(plan, indexes, positions, scope=scope)
+                        strategy = 'refine'
+                    else:
+                        positions = self.execute_plan(plan, indexes, positions, limit, ranks, memo)
+                        ordered = True
+                        strategy = 'execute' if limit is None else 'execute_top_k'
+                    if trace is not None:
+                        trace.strategy = strategy
+                        if strategy == 'refine':
+                            trace.cache['refine'] = self.refine_cache.hits > refine_hits
+                        trace.mark('description', rows_in, len(positions))
                 else:
                     print(f"Warning: Description column '{description_column}' not found")
         
-        # Apply valve number search if provided
-        if valve_search.strip():
-            valve_column = 'Valve Number'  # Configurable
-            if valve_column in results.columns:
-                # Exact match for valve number
-                results = results[results[valve_column].astype(str).str.lower() == valve_search.lower()]
+        counts = None
+        if facet_counts:
+            if indexes.cube is None:
+                print("Warning: Facet count columns not found")
             else:
-                print(f"Warning: Valve column '{valve_column}' not found")
+                counts = indexes.cube.counts(positions)
+            if trace is not None:
+                trace.mark('facet_counts')
+        
+        if positions is None:
+            positions = np.arange(indexes.row_count, dtype=np.int64)
+        if ranks is not None and not ordered:
+            # Top-k by rank: O(matches) selection, only the kept rows are sorted
+            rows_in = len(positions)
+            positions = top_k(positions, max_results + 1, ranks)
+            if trace is not None:
+                trace.mark('sort', rows_in, len(positions))
         
         # Limit results
-        if len(results) > max_results:
-            results = results.head(max_results)
+        truncated = len(positions) > max_results
+        if truncated:
+            positions = positions[:max_results]
             print(f"Results limited to {max_results} records")
+        if scores is not None:
+            scores = scores[:len(positions)]
+        
+        positions.setflags(write=False)  # Shared by later cache hits
+        if plan is None or plan.complete:
+            self.result_cache.put(cache_key, (positions, truncated, scores, counts))
+        if trace is not None:
+            trace.mark('store')
+        return SearchResult(indexes, positions, columns, truncated, scores, counts)
+    
+    def _start_trace(self, operation: str, description_search: str, valve_search: str, max_results: int,
+                     match_mode: str, incremental: bool, sort_by: Optional[str], tag_search: str,
+                     facets: Optional[Dict[str, Union[str, List[str]]]], facet_counts: bool) -> SearchTrace:
+        return self.tracer.start(operation, {
+            'description': description_search, 'valve': valve_search, 'tag': tag_search,
+            'match_mode': match_mode, 'max_results': max_results, 'incremental': incremental,
+            'sort_by': sort_by, 'facets': facets, 'facet_counts': facet_counts,
+        })
+    
+    def enable_tracing(self, output: Union[str, IO[str], None] = None, keep: int = 1000) -> Tracer:
+        """
+        Trace every search from now on (see search_trace): per-stage timings, rows in and out
+        of each filter, cache hits and the plan. Traces are kept in tracer.traces (the last
+        keep) and, with output (file path or text stream), written as JSON lines.
+        
+        Returns:
+            The Tracer (tracer.summary() gives p50/p95/p99 per stage)
+        """
+        self.disable_tracing()
+        self.tracer = Tracer(output, keep)
+        return self.tracer
+    
+    def disable_tracing(self):
+        """Stop tracing (closes a trace file opened by enable_tracing)."""
+        if self.tracer is not None:
+            self.tracer.close()
+            self.tracer = None
+    
+    @staticmethod
+    def _valve_query(valve_search: str) -> str:
+        """Valve search as matched (case-insensitive exact match, surrounding blanks ignored)."""
+        return valve_search.strip().lower()
+    
+    def result_cache_key(self, description_search: str, valve_search: str, max_results: int,
+                         match_mode: str, sort_by: Optional[str], tag_search: str,
+                         facets: Optional[Dict[str, Union[str, List[str]]]], facet_counts: bool,
+                         indexes: SearchIndexes) -> Tuple:
+        """
+        Result cache key: normalized query, filters and mode plus the synonym and data versions.
         
-        # Sort by description (equivalent to VBA sorting)
-        description_column = 'Equipment Description'
-        if description_column in results.columns:
-            results = results.sort_values(by=description_column)
+        Loading data (or assigning engine.data, e.g. with cleaned descriptions applied) gives a
+        new data version and loading a mapping a new synonym version, so stale entries can
+        never be hit; both also clear the cache to release its memory.
+        """
+        key = (' '.join(description_search.lower().split()), self._valve_query(valve_search),
+               ' '.join(tag_search.upper().split()) if len(tag_search.strip()) >= TAG_SEARCH_MIN_LEN else '',
+               self._facet_key(facets), match_mode, max_results, sort_by, facet_counts,
+               self.synonyms.version, indexes.version)
+        if match_mode == 'fuzzy':
+            key += (self.fuzzy_threshold, self.fuzzy_time_budget)
+        if tag_search.strip() and (self.tag_sys_codes is not None or self.tag_obj_codes is not None):
+            key += (tuple(sorted(self.tag_sys_codes or ())), tuple(sorted(self.tag_obj_codes or ())))
+        return key
+    
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit ratio, occupancy and bytes held for the plan, typeahead and result caches."""
+        return {
+            'plans': self.plan_cache.stats(),
+            'refine': self.refine_cache.stats(),
+            'results': self.result_cache.stats(),
+        }
+    
+    def open_cursor(self,
+                    description_search: str = "",
+                    valve_search: str = "",
+                    page_size: int = 100,
+                    match_mode: str = 'all',
+                    columns: Optional[List[str]] = None,
+                    sort_by: Optional[str] = 'Equipment Description',
+                    tag_search: str = "",
+                    facets: Optional[Dict[str, Union[str, List[str]]]] = None) -> 'SearchCursor':
+        """
+        Search without the max_results cap and return a cursor for paging through the result.
         
-        return results
+        Arguments are as in search_equipment. Exporters can walk every match with
+        cursor.pages(); UIs can jump straight to cursor.page(k).
+        """
+        indexes = self._indexes
+        result = self.search(description_search, valve_search, max(indexes.row_count, 1), match_mode,
+                             False, columns, sort_by, tag_search, facets)
+        plan = None
+        if description_search.strip():
+            plan = self.plan_query(description_search, match_mode, indexes=indexes)
+        return SearchCursor(result, plan, page_size)
+    
+    def search_many(self,
+                    queries: Iterable[Union[str, Tuple[str, str]]],
+                    max_results: int = 1000,
+                    match_mode: str = 'all',
+                    columns: Optional[List[str]] = None,
+                    sort_by: Optional[str] = 'Equipment Description',
+                    facets: Optional[Dict[str, Union[str, List[str]]]] = None,
+                    processes: Optional[int] = None) -> 'BatchResult':
+        """
+        Run a batch of searches, e.g. the valve numbers and descriptions of a work package.
+        
+        Identical queries (after normalizing case and whitespace) run once. The whole batch runs
+        against the indexes current when it starts (a concurrent reload does not affect it).
+        Within the batch, synonym expansions come from the plan cache and term posting lookups
+        are shared between queries. Per-query messages are suppressed; one summary line is printed.
+        
+        Args:
+            queries: List or stream of description strings or (description, valve) pairs
+            max_results, match_mode, columns, sort_by, facets: As in search_equipment, for every query
+            processes: Fan unique queries out over this many worker processes. Workers attach to
+                the published indexes (see publish_indexes) instead of copying the data.
+            
+        Returns:
+            BatchResult mapping each input position to its SearchResult
+        """
+        start = time.perf_counter()
+        indexes = self._indexes
+        items = [(query, '') if isinstance(query, str) else (query[0] or '', query[1] or '')
+                 for query in queries]
+        
+        # Deduplicate: normalized (description, valve) -> input positions
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        for position, (description, valve) in enumerate(items):
+            key = (' '.join(description.lower().split()), self._valve_query(valve))  # As _search matches it
+            groups.setdefault(key, []).append(position)
+        unique = [items[positions[0]] for positions in groups.values()]
+        options = dict(max_results=max_results, match_mode=match_mode, sort_by=sort_by, facets=facets)
+        
+        if processes and processes > 1:
+            settings = {'fuzzy_threshold': self.fuzzy_threshold, 'fuzzy_time_budget': self.fuzzy_time_budget,
+                        'tag_sys_codes': self.tag_sys_codes, 'tag_obj_codes': self.tag_obj_codes}
+            published = self.publish_indexes(indexes)
+            with ProcessPoolExecutor(processes, initializer=_init_batch_worker,
+                                     initargs=(published, self.synonyms.pairs, settings)) as pool:
+                chunk = max(1, len(unique) // (processes * 4))
+                outputs = list(pool.map(_batch_worker_search,
+                                        [(description, valve, options) for description, valve in unique],
+                                        chunksize=chunk))
+            executed = [SearchResult(indexes, positions, columns, truncated, scores)
+                        for positions, truncated, scores in outputs]
+        else:
+            memo: Dict = {}
+            executed = []
+            with _quiet():
+                for description, valve in unique:
+                    trace = None
+                    if self.tracer is not None:
+                        trace = self._start_trace('search_many', description, valve, max_results, match_mode,
+                                                  False, sort_by, '', facets, False)
+                    result = self._search(trace, description, valve, max_results, match_mode, False, columns,
+                                          sort_by, '', facets, False, indexes, memo)
+                    if trace is not None:
+                        self.tracer.finish(trace, len(result))
+                    executed.append(result)
+        
+        results: Dict[int, SearchResult] = {}
+        for result, positions in zip(executed, groups.values()):
+            for position in positions:
+                results[position] = result
+        
+        batch = BatchResult(results, len(unique), time.perf_counter() - start)
+        print(f"Batch search: {len(items)} queries ({batch.unique} unique) in {batch.elapsed:.2f}s "
+              f"- {batch.throughput:.0f} queries/s")
+        return batch
+    
+    def publish_indexes(self, indexes: Optional[SearchIndexes] = None) -> str:
+        """
+        Publish the loaded data and indexes for worker processes (search_many pools, cleanup,
+        shard servers) and return the file they attach to (search_snapshot.attach).
+        
+        Array data (numeric and categorical columns, postings, ranks, key and tag indexes) is
+        memory-mapped by every worker from one shared copy. The file is written once per data
+        version and removed when that index set is discarded.
+        """
+        indexes = indexes or self._indexes
+        if self._published is not None and self._published[0] == indexes.version:
+            return self._published[1]
+        path = publish(indexes)
+        weakref.finalize(indexes, _remove_published, path)
+        self._published = (indexes.version, path)
+        return path
+    
+    def lookup_key(self, column: str, value: str, prefix: bool = False) -> pd.DataFrame:
+        """
+        Rows whose identifier matches value, using the key index for the column.
+        
+        Args:
+            column: 'Valve Number', 'SAP Equipment ID' or 'Tag ID'
+            value: Identifier to look up (normalized like tools/apply_cleaned_to_excel._norm_id)
+            prefix: Match identifiers that start with value instead of equal it
+        """
+        indexes = self._indexes
+        key_index = indexes.keys.get(column)
+        if key_index is None:
+            print(f"Warning: Key column '{column}' not found")
+            return pd.DataFrame(columns=indexes.data.columns)
+        
+        positions = key_index.lookup_prefix(value) if prefix else key_index.lookup(value)
+        return indexes.data.iloc[positions]
     
     def output_no_results(self) -> pd.DataFrame:
         """Return empty DataFrame with column headers (equivalent to VBA OutputNoResults)."""
@@ -167,35 +1290,57 @@ class EquipmentSearchEngine:
     
     def output_all_visible(self, max_results: int = 1000) -> pd.DataFrame:
         """Return all visible data (equivalent to VBA OutputAllVisible)."""
-        if self.data.empty:
+        indexes = self._indexes
+        if indexes.data.empty:
             return pd.DataFrame()
         
-        results = self.data.copy()
+        results = SearchResult(indexes, np.arange(min(indexes.row_count, max_results), dtype=np.int64))
         
-        if len(results) > max_results:
-            results = results.head(max_results)
+        if indexes.row_count > max_results:
             print(f"Displayed {max_results} visible rows.")
         else:
             print(f"Displayed {len(results)} visible rows.")
         
-        return results
+        return results.to_frame()
     
-    def refresh_results(self, description_search: str = "", valve_search: str = "") -> pd.DataFrame:
+    def refresh_results(self, description_search: str = "", valve_search: str = "",
+                        incremental: bool = True, tag_search: str = "",
+                        facets: Optional[Dict[str, Union[str, List[str]]]] = None) -> pd.DataFrame:
         """
         Main entry point - equivalent to VBA RefreshResults.
         Decides whether to search, show all, or show no results.
+        Called per keystroke, so searches refine cached earlier results by default.
         """
         # Check if we have active search criteria
         desc_active = len(description_search.strip()) > 0
         valve_active = len(valve_search.strip()) >= 3  # Minimum length like VBA
+        tag_active = len(tag_search.strip()) >= TAG_SEARCH_MIN_LEN
         
-        if desc_active or valve_active:
-            print(f"Performing search: desc='{description_search}', valve='{valve_search}'")
-            return self.search_equipment(description_search, valve_search)
+        if desc_active or valve_active or tag_active:
+            print(f"Performing search: desc='{description_search}', valve='{valve_search}', tag='{tag_search}'")
+            return self.search_equipment(description_search, valve_search, incremental=incremental,
+                                         tag_search=tag_search, facets=facets)
         else:
             print("No search criteria provided - showing no results")
             return self.output_no_results()  # Changed from output_all_visible to match VBA update
     
+    def memory_report(self) -> pd.DataFrame:
+        """
+        Bytes per column before and after load-time compaction (deep memory usage).
+        
+        For data assigned directly (no compaction) or updated by apply_delta, before and after
+        are the current usage.
+        """
+        indexes = self._indexes
+        if indexes.memory_report is not None:
+            return indexes.memory_report
+        usage = indexes.data.memory_usage(deep=True, index=False)
+        dtypes = indexes.data.dtypes.astype(str)
+        report = pd.DataFrame({'dtype_before': dtypes, 'bytes_before': usage,
+                               'dtype_after': dtypes, 'bytes_after': usage})
+        report.loc['Total'] = ['', usage.sum(), '', usage.sum()]
+        return report
+    
     def get_column_info(self) -> Dict[str, Any]:
         """Get information about available columns."""
         if self.data.empty:
@@ -208,6 +1353,81 @@ class EquipmentSearchEngine:
             'sample_row': self.data.head(1).to_dict('records')[0] if len(self.data) > 0 else {}
         }
 
+class _ThreadStdout:
+    """sys.stdout proxy whose output can be suppressed per thread (see _quiet)."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text: str) -> int:
+        if getattr(self.local, 'quiet', 0):
+            return len(text)
+        return self.stream.write(text)
+
+    def __getattr__(self, name: str):
+        return getattr(self.stream, name)
+
+
+@contextlib.contextmanager
+def _quiet():
+    """
+    Suppress console messages printed by the current thread only.
+    
+    Unlike contextlib.redirect_stdout (which swaps sys.stdout for every thread), other threads
+    searching or reloading at the same time keep printing.
+    """
+    if not isinstance(sys.stdout, _ThreadStdout):
+        sys.stdout = _ThreadStdout(sys.stdout)
+    local = sys.stdout.local
+    local.quiet = getattr(local, 'quiet', 0) + 1
+    try:
+        yield
+    finally:
+        local.quiet -= 1
+
+
+def _result_bytes(entry: Tuple) -> int:
+    """Approximate memory held by a result cache entry."""
+    positions, _, scores, _ = entry
+    return positions.nbytes + (scores.nbytes if scores is not None else 0) + 200
+
+
+# Per-process engine for search_many(processes=N)
+_batch_engine: Optional[EquipmentSearchEngine] = None
+_batch_memo: Dict = {}  # Term resolutions shared by a worker's queries (its indexes never change)
+
+
+def _remove_published(path: str):
+    """Delete a published index file (ignored if a worker still holds it open on Windows)."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _init_batch_worker(published: str, synonym_pairs: List[Tuple[str, str]], settings: Dict[str, Any]):
+    """Process pool initializer: attach to the published indexes once per worker."""
+    global _batch_engine
+    engine = EquipmentSearchEngine()
+    engine._set_indexes(attach(published))
+    engine.synonyms = SynonymTable(synonym_pairs)
+    for name, value in settings.items():
+        setattr(engine, name, value)
+    _batch_memo.clear()
+    _batch_engine = engine
+
+
+def _batch_worker_search(args: Tuple[str, str, Dict[str, Any]]) -> Tuple[np.ndarray, bool, Optional[np.ndarray]]:
+    """Run one batch query in a worker; only positions travel back to the parent."""
+    description, valve, options = args
+    with _quiet():
+        result = _batch_engine._search(None, description, valve, options['max_results'], options['match_mode'],
+                                       False, None, options['sort_by'], '', options['facets'], False,
+                                       memo=_batch_memo)
+    return np.asarray(result.positions), result.truncated, result.scores
+
+
 def create_sample_data():
     """Create sample equipment data for testing."""
     sample_data = [
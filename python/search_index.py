@@ -0,0 +1,804 @@
+"""
+Search Indexes - Python Version
+===============================
+Precomputed lookup structures for the Python search engine.
+Indexes are built once per dataset load so individual searches avoid full table scans.
+"""
+
+import bisect
+import itertools
+import math
+import re
+from collections import Counter
+from typing import List, Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Word tokens as seen by the regex \b boundaries used in description searches
+_TOKEN_RE = re.compile(r'\w+')
+
+# Digit runs as matched by VBScript \d (ASCII only), see VBA LastDigits
+_DIGITS_RE = re.compile(r'[0-9]+')
+
+EMPTY_POSITIONS = np.zeros(0, dtype=np.int64)
+
+# Every index build gets a new data version (used in cache keys)
+_DATA_VERSIONS = itertools.count(1)
+
+# Identifier columns with exact/prefix key indexes
+KEY_COLUMNS = ('Valve Number', 'SAP Equipment ID', 'Tag ID')
+
+# Column parsed into sys/obj/num parts for tag search
+TAG_COLUMN = 'Tag ID'
+
+# Slicer-style filter columns with per-value bitmaps
+FACET_COLUMNS = ('Functional System Category', 'Functional System', 'Work Area', 'Object Type')
+
+# Drill-down levels of the facet count cube
+FACET_HIERARCHY = ('Functional System Category', 'Functional System', 'Object Type')
+
+# Text columns with at most this share of distinct values are stored as categoricals
+CATEGORY_MAX_RATIO = 0.05
+
+# BM25 parameters for relevance-ranked search
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Output columns whose sort ranks are built at load time (others are built on first use)
+SORT_COLUMNS = ('Equipment Description', 'SAP Equipment ID', 'Valve Number', 'Tag ID',
+                'Functional System', 'Work Area', 'Object Type')
+
+
+def tokenize(text: object) -> List[str]:
+    """Split text into lowercase word tokens (non-text values have no tokens)."""
+    if not isinstance(text, str):
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+def trigrams(term: str) -> List[str]:
+    """Character trigrams of a term, padded so short terms and word edges count."""
+    padded = f'  {term} '
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def norm_id(val: object) -> str:
+    """Normalize an identifier the same way as tools/apply_cleaned_to_excel._norm_id."""
+    s = '' if val is None else str(val).strip()
+    # If looks like a float with .0, strip it
+    if s.endswith('.0') and s.replace('.', '', 1).isdigit():
+        try:
+            s = str(int(float(s)))
+        except Exception:
+            pass
+    # Prefer digit-only normalization when present
+    digits = ''.join(ch for ch in s if ch.isdigit())
+    return digits if digits else s
+
+
+def last_digits(text: str) -> str:
+    """Last contiguous run of digits in text ('' if none) - VBA LastDigits."""
+    runs = _DIGITS_RE.findall(text)
+    return runs[-1] if runs else ''
+
+
+def is_letters(text: str) -> bool:
+    """True when text is non-empty and all A-Z - VBA IsLetters (expects uppercase input)."""
+    return bool(text) and all('A' <= ch <= 'Z' for ch in text)
+
+
+def parse_row_tag(value: object) -> Tuple[str, str, str]:
+    """
+    Split a row's Tag ID into (sys, obj, num) - VBA ParseRowTag.
+
+    sys is the first token when it is 2-3 letters, obj the second token when it is exactly
+    2 letters, num the last digit run seen in the first three tokens (so 'C3003*P' gives
+    '3003'), falling back to the last digit run anywhere.
+    """
+    text = '' if value is None or (not isinstance(value, str) and pd.isna(value)) else str(value)
+    upper = text.strip(' ').upper()
+    if not upper:
+        return '', '', ''
+    toks = upper.split(' ')
+    sys_code = toks[0] if is_letters(toks[0]) and 2 <= len(toks[0]) <= 3 else ''
+    obj_code = toks[1] if len(toks) > 1 and is_letters(toks[1]) and len(toks[1]) == 2 else ''
+    num = ''
+    for tok in toks[:3]:
+        num = last_digits(tok) or num
+    return sys_code, obj_code, num or last_digits(upper)
+
+
+def parse_tag_query(query: str, sys_codes: Set[str], obj_codes: Set[str]) -> Tuple[str, str, str]:
+    """
+    Split a tag search into (sys, obj, num) - VBA ParseTagQuery.
+
+    Tokens with digits set num (their last digit run); 2-3 letter tokens set sys when they are
+    a known system code, otherwise obj when they are a known 2-letter object code. Without
+    any digit token, num falls back to the last digit run of the whole query.
+    """
+    q_sys = q_obj = q_num = ''
+    query = query.strip(' ')
+    if not query:
+        return q_sys, q_obj, q_num
+    for tok in query.split(' '):
+        tok = tok.strip(' ').upper()
+        if not tok:
+            continue
+        if any('0' <= ch <= '9' for ch in tok):
+            q_num = last_digits(tok)
+        elif is_letters(tok) and 2 <= len(tok) <= 3:
+            if tok in sys_codes:
+                q_sys = tok
+            elif len(tok) == 2 and tok in obj_codes:
+                q_obj = tok
+    return q_sys, q_obj, q_num or last_digits(query.upper())
+
+
+def compact_frame(frame: pd.DataFrame,
+                  max_ratio: float = CATEGORY_MAX_RATIO) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Store low-cardinality text columns as categoricals (one int code per row + distinct values).
+
+    A column qualifies when all its values are text (or blank) and its distinct values are at
+    most max_ratio of the rows - e.g. Functional System, Work Area, Object Type.
+
+    Returns:
+        (compacted frame, memory report with bytes per column before and after)
+    """
+    before = frame.memory_usage(deep=True, index=False)
+    compacted = frame.copy(deep=False)
+    rows = len(frame)
+    for column in frame.columns:
+        values = frame[column]
+        if isinstance(values.dtype, pd.CategoricalDtype) or not rows:
+            continue
+        if pd.api.types.infer_dtype(values, skipna=True) != 'string':
+            continue
+        if values.nunique(dropna=True) <= max_ratio * rows:
+            compacted[column] = values.astype('category')
+    after = compacted.memory_usage(deep=True, index=False)
+
+    report = pd.DataFrame({
+        'dtype_before': frame.dtypes.astype(str),
+        'bytes_before': before,
+        'dtype_after': compacted.dtypes.astype(str),
+        'bytes_after': after,
+    })
+    report.loc['Total'] = ['', before.sum(), '', after.sum()]
+    return compacted, report
+
+
+def union_positions(arrays: List[np.ndarray]) -> np.ndarray:
+    """Union of sorted row-position arrays."""
+    arrays = [a for a in arrays if len(a)]
+    if not arrays:
+        return EMPTY_POSITIONS
+    if len(arrays) == 1:
+        return arrays[0]
+    return np.unique(np.concatenate(arrays))
+
+
+def intersect_positions(arrays: List[np.ndarray]) -> np.ndarray:
+    """Intersection of sorted row-position arrays, smallest first."""
+    if not arrays:
+        return EMPTY_POSITIONS
+    arrays = sorted(arrays, key=len)
+    result = arrays[0]
+    for arr in arrays[1:]:
+        if not len(result):
+            break
+        result = np.intersect1d(result, arr, assume_unique=True)
+    return result
+
+
+class TokenIndex:
+    """
+    Inverted index: description token -> sorted array of row positions.
+
+    Also keeps the per-row statistics used for relevance ranking: term frequencies aligned
+    with each posting list, token counts per row, and each row's first token.
+    """
+
+    def __init__(self, values: pd.Series):
+        self.row_count = len(values)
+        postings: Dict[str, List[int]] = {}
+        freqs: Dict[str, List[int]] = {}
+        lengths = np.zeros(self.row_count, dtype=np.int32)
+        first_tokens = np.full(self.row_count, '', dtype=object)
+        for pos, text in enumerate(values.tolist()):
+            tokens = tokenize(text)
+            if not tokens:
+                continue
+            lengths[pos] = len(tokens)
+            first_tokens[pos] = tokens[0]
+            for token, count in Counter(tokens).items():
+                postings.setdefault(token, []).append(pos)
+                freqs.setdefault(token, []).append(count)
+        self.postings: Dict[str, np.ndarray] = {
+            token: np.asarray(rows, dtype=np.int64) for token, rows in postings.items()
+        }
+        self.freqs: Dict[str, np.ndarray] = {
+            token: np.asarray(counts, dtype=np.int32) for token, counts in freqs.items()
+        }
+        self.doc_lengths = lengths
+        self.avg_length = float(lengths.mean()) if self.row_count else 0.0
+        self.first_tokens = first_tokens
+        self._trigrams: Optional[TrigramIndex] = None
+
+    def apply_delta(self, delta: 'RowDelta', stale_texts: Iterable[object],
+                    changed_texts: Iterable[object]) -> 'TokenIndex':
+        """
+        Index of the next generation: only the changed rows are tokenized.
+
+        Args:
+            delta: Row mapping to the next generation
+            stale_texts: Old texts of the rows delta drops (deleted or updated)
+            changed_texts: New texts of delta.changed rows, in order
+        """
+        index = TokenIndex.__new__(TokenIndex)
+        index.row_count = delta.new_count
+        lengths = delta.take(self.doc_lengths)
+        first_tokens = delta.take(self.first_tokens)
+        added_rows: Dict[str, List[int]] = {}
+        added_freqs: Dict[str, List[int]] = {}
+        for pos, text in zip(delta.changed.tolist(), changed_texts):
+            tokens = tokenize(text)
+            lengths[pos] = len(tokens)
+            first_tokens[pos] = tokens[0] if tokens else ''
+            for token, count in Counter(tokens).items():
+                added_rows.setdefault(token, []).append(pos)
+                added_freqs.setdefault(token, []).append(count)
+        touched = {token for text in stale_texts for token in tokenize(text)}
+
+        postings: Dict[str, np.ndarray] = {}
+        freqs: Dict[str, np.ndarray] = {}
+        for token, rows in self.postings.items():
+            counts = self.freqs[token]
+            if delta.moved or token in touched or token in added_rows:
+                new_rows = delta.remap[rows]
+                keep = new_rows >= 0
+                rows, counts = new_rows[keep], counts[keep]
+                if token in added_rows:
+                    rows = np.concatenate([rows, np.asarray(added_rows.pop(token), dtype=np.int64)])
+                    counts = np.concatenate([counts, np.asarray(added_freqs.pop(token), dtype=np.int32)])
+                    order = np.argsort(rows, kind='stable')
+                    rows, counts = rows[order], counts[order]
+                if not len(rows):
+                    continue
+            postings[token] = rows
+            freqs[token] = counts
+        for token, rows in added_rows.items():
+            postings[token] = np.asarray(rows, dtype=np.int64)
+            freqs[token] = np.asarray(added_freqs[token], dtype=np.int32)
+
+        index.postings = postings
+        index.freqs = freqs
+        index.doc_lengths = lengths
+        index.avg_length = float(lengths.mean()) if index.row_count else 0.0
+        index.first_tokens = first_tokens
+        # Same vocabulary - the fuzzy trigram index still applies
+        index._trigrams = self._trigrams if self._trigrams is not None and postings.keys() == self.postings.keys() else None
+        return index
+
+    @property
+    def trigrams(self) -> 'TrigramIndex':
+        """Trigram index over the vocabulary (built on first fuzzy search)."""
+        if self._trigrams is None:
+            self._trigrams = TrigramIndex(list(self.postings))
+        return self._trigrams
+
+    def lookup(self, token: str) -> np.ndarray:
+        """Rows containing the token as a whole word."""
+        return self.postings.get(token, EMPTY_POSITIONS)
+
+    def bm25(self, rows: np.ndarray, freqs: np.ndarray) -> np.ndarray:
+        """BM25 weight of a term for each of its rows, given the term's frequency in each row."""
+        doc_freq = len(rows)
+        idf = math.log(1.0 + (self.row_count - doc_freq + 0.5) / (doc_freq + 0.5))
+        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_lengths[rows] / max(self.avg_length, 1.0))
+        return idf * freqs * (BM25_K1 + 1.0) / (freqs + norm)
+
+    def estimate(self, alternatives: List[str]) -> int:
+        """Upper bound on rows matching any alternative, from posting-list lengths."""
+        total = 0
+        for alt in alternatives:
+            words = tokenize(alt)
+            if not words:
+                return self.row_count
+            total += min(len(self.lookup(w)) for w in words)
+        return min(total, self.row_count)
+
+    def resolve(self, alternatives: List[str]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Resolve a token's alternatives to (sure, maybe) row positions.
+
+        Single-word alternatives are answered exactly from the postings. Phrases and
+        alternatives with punctuation only narrow the candidates, which the caller must
+        confirm with the regex. maybe is None when the index cannot narrow at all.
+        """
+        sure: List[np.ndarray] = []
+        maybe: List[np.ndarray] = []
+        for alt in alternatives:
+            words = tokenize(alt)
+            if not words:
+                return union_positions(sure), None
+            if _TOKEN_RE.fullmatch(alt):
+                sure.append(self.lookup(words[0]))
+            else:
+                # Every word of the phrase must appear as a whole token in a matching row
+                maybe.append(intersect_positions([self.lookup(w) for w in words]))
+        sure_rows = union_positions(sure)
+        maybe_rows = union_positions(maybe)
+        if len(maybe_rows) and len(sure_rows):
+            maybe_rows = np.setdiff1d(maybe_rows, sure_rows, assume_unique=True)
+        return sure_rows, maybe_rows
+
+
+class TrigramIndex:
+    """Character trigram -> vocabulary term ids, for shortlisting fuzzy match candidates."""
+
+    def __init__(self, vocabulary: List[str]):
+        self.terms = vocabulary
+        self.lengths = np.array([len(term) for term in vocabulary], dtype=np.int32)
+        grams: Dict[str, List[int]] = {}
+        for term_id, term in enumerate(vocabulary):
+            for gram in set(trigrams(term)):
+                grams.setdefault(gram, []).append(term_id)
+        self.grams: Dict[str, np.ndarray] = {
+            gram: np.asarray(ids, dtype=np.int32) for gram, ids in grams.items()
+        }
+
+    def shortlist(self, token: str, threshold: float, limit: int) -> List[str]:
+        """
+        Up to limit terms sharing the most trigrams with token.
+
+        Terms whose length difference alone rules out a similarity ratio >= threshold
+        (0-100) are dropped before ranking.
+        """
+        hits = [self.grams[gram] for gram in set(trigrams(token)) if gram in self.grams]
+        if not hits:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.terms))
+        ids = np.flatnonzero(shared)
+        lengths = self.lengths[ids]
+        ids = ids[np.abs(lengths - len(token)) <= (1.0 - threshold / 100.0) * (lengths + len(token))]
+        if len(ids) > limit:
+            ids = ids[np.argpartition(-shared[ids], limit - 1)[:limit]]
+        ids = ids[np.argsort(-shared[ids], kind='stable')]
+        return [self.terms[term_id] for term_id in ids]
+
+
+class KeyIndex:
+    """
+    Exact and prefix index over an identifier column.
+
+    Keys are normalized with norm_id. Row positions are grouped by sorted key, so a key or a
+    key prefix maps to one contiguous slice found by binary search. Everything is stored in
+    fixed-width NumPy arrays (no per-key Python objects), so a snapshot of the index can be
+    memory-mapped and shared between processes as is.
+    """
+
+    def __init__(self, values: pd.Series):
+        self._build(*self._parse(values))
+
+    @staticmethod
+    def _parse(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-row (lowercased raw text, normalized key) arrays."""
+        raw = [v if isinstance(v, str) else ('' if pd.isna(v) else str(v)) for v in values.tolist()]
+        return np.array([v.lower() for v in raw], dtype=str), np.array([norm_id(v) for v in raw], dtype=str)
+
+    def _build(self, raw_lower: np.ndarray, keys: np.ndarray):
+        # Lowercased raw text, for callers that need case-insensitive exact equality
+        self.raw_lower = raw_lower
+        self.order = np.argsort(keys, kind='stable').astype(np.int64)
+        self.keys, starts = np.unique(keys[self.order], return_index=True)
+        self.bounds = np.append(starts, len(self.order)).astype(np.int64)
+
+    def apply_delta(self, delta: 'RowDelta', changed_values: pd.Series) -> 'KeyIndex':
+        """Index of the next generation: only delta.changed rows (changed_values) are normalized."""
+        row_keys = np.empty(len(self.order), dtype=self.keys.dtype)
+        row_keys[self.order] = np.repeat(self.keys, np.diff(self.bounds))
+        raw_lower, keys = self._parse(changed_values)
+        index = KeyIndex.__new__(KeyIndex)
+        index._build(delta.take(self.raw_lower, raw_lower), delta.take(row_keys, keys))
+        return index
+
+    def _slice(self, lo: int, hi: int) -> np.ndarray:
+        return np.sort(self.order[self.bounds[lo]:self.bounds[hi]])
+
+    def lookup(self, value: object) -> np.ndarray:
+        """Sorted row positions whose normalized key equals the value's."""
+        key = norm_id(value)
+        slot = int(np.searchsorted(self.keys, key))
+        if slot >= len(self.keys) or self.keys[slot] != key:
+            return EMPTY_POSITIONS
+        return self._slice(slot, slot + 1)
+
+    def lookup_prefix(self, prefix: object) -> np.ndarray:
+        """Sorted row positions whose normalized key starts with the normalized prefix."""
+        key = norm_id(prefix)
+        if not key:
+            return EMPTY_POSITIONS
+        lo = int(np.searchsorted(self.keys, key))
+        hi = int(np.searchsorted(self.keys, key + '\uffff'))
+        return self._slice(lo, hi)
+
+
+class TagIndex:
+    """
+    Tag IDs parsed once into columnar sys/obj/num arrays (VBA ParseRowTag per row).
+
+    Rows are also grouped by system code, and tag numbers are kept as a sorted array of
+    reversed digit strings: "number ends with" (TagMatchRank's Right$(rNum, Len(qNum)) = qNum)
+    becomes a prefix of the reversed strings, i.e. one contiguous range found by bisect.
+    A tag query therefore touches only the rows it matches instead of re-parsing every Tag ID.
+    """
+
+    def __init__(self, values: pd.Series):
+        sys_codes, obj_codes, nums = self._parse(values)
+        self._build(sys_codes, obj_codes, nums, np.array([num[::-1] for num in nums.tolist()], dtype=object))
+
+    @staticmethod
+    def _parse(values: pd.Series) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Per-row sys, obj and num arrays."""
+        parts = [parse_row_tag(v) for v in values.tolist()]
+        sys_codes, obj_codes, nums = zip(*parts) if parts else ((), (), ())
+        return np.array(sys_codes, dtype=str), np.array(obj_codes, dtype=str), np.array(nums, dtype=str)
+
+    def _build(self, sys_codes: np.ndarray, obj_codes: np.ndarray, nums: np.ndarray, reversed_nums: np.ndarray):
+        self.sys = sys_codes
+        self.obj = obj_codes
+        self.num = nums
+        # Codes seen in the data (default code sets for parse_tag_query)
+        self.sys_codes: Set[str] = set(np.unique(sys_codes).tolist()) - {''}
+        self.obj_codes: Set[str] = set(np.unique(obj_codes).tolist()) - {''}
+
+        # Rows grouped by system code (a stable sort keeps each group's rows ascending)
+        order = np.argsort(sys_codes, kind='stable').astype(np.int64)
+        codes, starts = np.unique(sys_codes[order], return_index=True)
+        bounds = np.append(starts, len(order))
+        self.by_sys: Dict[str, np.ndarray] = {
+            code: order[bounds[i]:bounds[i + 1]] for i, code in enumerate(codes.tolist()) if code
+        }
+
+        self.suffix_order = np.argsort(reversed_nums, kind='stable').astype(np.int64)
+        self.suffix_keys: List[str] = reversed_nums[self.suffix_order].tolist()
+
+    def apply_delta(self, delta: 'RowDelta', changed_values: pd.Series) -> 'TagIndex':
+        """Index of the next generation: only delta.changed rows (changed_values) are parsed."""
+        reversed_nums = np.empty(len(self.suffix_order), dtype=object)
+        reversed_nums[self.suffix_order] = self.suffix_keys
+        sys_codes, obj_codes, nums = self._parse(changed_values)
+        index = TagIndex.__new__(TagIndex)
+        index._build(delta.take(self.sys, sys_codes), delta.take(self.obj, obj_codes), delta.take(self.num, nums),
+                     delta.take(reversed_nums, np.array([num[::-1] for num in nums.tolist()], dtype=object)))
+        return index
+
+    def ends_with(self, digits: str) -> np.ndarray:
+        """Sorted row positions whose tag number ends with digits (O(log n + k))."""
+        if not digits:
+            return EMPTY_POSITIONS
+        key = digits[::-1]
+        lo = bisect.bisect_left(self.suffix_keys, key)
+        hi = bisect.bisect_left(self.suffix_keys, key + '\uffff', lo)
+        return np.sort(self.suffix_order[lo:hi])
+
+    def matches(self, q_sys: str, q_obj: str, q_num: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Matching rows and their rank tiers - VBA TagMatchRank restricted to rows ranked >= 0.
+
+        0 = sys+num match and obj matches (or no obj asked for), 1 = sys+num match with a
+        different obj, 2 = num-only or sys-only match.
+
+        Returns:
+            (sorted positions, int8 tiers aligned with them)
+        """
+        if not q_sys and not q_num:
+            return EMPTY_POSITIONS, np.zeros(0, dtype=np.int8)
+        # A matched system code or number also makes the row conforming
+        parts = []
+        if q_sys:
+            parts.append(self.by_sys.get(q_sys, EMPTY_POSITIONS))
+        if q_num:
+            parts.append(self.ends_with(q_num))
+        positions = intersect_positions(parts)
+        if q_sys and q_num:
+            tiers = np.zeros(len(positions), dtype=np.int8)
+            if q_obj:
+                tiers[self.obj[positions] != q_obj] = 1
+        else:
+            tiers = np.full(len(positions), 2, dtype=np.int8)
+        return positions, tiers
+
+    def rank(self, q_sys: str, q_obj: str, q_num: str) -> np.ndarray:
+        """Rank tier of every row (-1 = no match) - VBA TagMatchRank for the whole column."""
+        ranks = np.full(len(self.sys), -1, dtype=np.int8)
+        positions, tiers = self.matches(q_sys, q_obj, q_num)
+        ranks[positions] = tiers
+        return ranks
+
+
+class FacetIndex:
+    """
+    Per-value row bitmaps for a facet column (packed bits, one row per distinct value).
+
+    Selecting values ORs their bitmaps; facets are combined by ANDing the results, so a facet
+    filter costs a few vectorized byte operations regardless of how many rows match.
+    """
+
+    def __init__(self, values: pd.Series):
+        self.row_count = len(values)
+        categorical = pd.Categorical(values.astype(str).where(values.notna(), ''))
+        self.values: List[str] = [str(v) for v in categorical.categories]
+        self.slots: Dict[str, int] = {value: slot for slot, value in enumerate(self.values)}
+        codes = categorical.codes
+        self.bitmaps = np.packbits(codes[None, :] == np.arange(len(self.values))[:, None], axis=1)
+
+    def bitmap(self, selected: List[str]) -> np.ndarray:
+        """Packed bitmap of rows whose value is any of selected (unknown values match nothing)."""
+        slots = [self.slots[v] for v in selected if v in self.slots]
+        if not slots:
+            return np.zeros(self.bitmaps.shape[1], dtype=np.uint8)
+        return np.bitwise_or.reduce(self.bitmaps[slots], axis=0)
+
+
+class FacetCube:
+    """
+    Precomputed row counts per Category -> System -> Object Type cell.
+
+    Every row is assigned the id of its cell once at load, so counts for any result set are a
+    single bincount over the matching rows' cell ids (O(matches), no groupby), folded into
+    the hierarchy over the few hundred distinct cells.
+    """
+
+    def __init__(self, data: pd.DataFrame, levels: Tuple[str, ...] = FACET_HIERARCHY):
+        self.levels = levels
+        frame = data[list(levels)]
+        frame = frame.astype(str).where(frame.notna(), '')
+        cells, keys = pd.MultiIndex.from_frame(frame).factorize()
+        self.cells = cells.astype(np.int32)
+        self.keys: List[Tuple[str, ...]] = list(keys)
+        self.totals = np.bincount(self.cells, minlength=len(self.keys))
+
+    def counts(self, positions: Optional[np.ndarray] = None) -> Dict:
+        """
+        Nested counts for the given rows (all rows when None).
+
+        Returns:
+            {'count': n, 'children': {category: {'count': n, 'children': {system: ...}}}};
+            object type nodes have empty children
+        """
+        if positions is None:
+            cell_counts = self.totals
+        else:
+            cell_counts = np.bincount(self.cells[positions], minlength=len(self.keys))
+        root = {'count': 0, 'children': {}}
+        for key, count in zip(self.keys, cell_counts.tolist()):
+            if not count:
+                continue
+            node = root
+            node['count'] += count
+            for value in key:
+                node = node['children'].setdefault(value, {'count': 0, 'children': {}})
+                node['count'] += count
+        return root
+
+
+def bitmap_positions(bitmap: np.ndarray, row_count: int) -> np.ndarray:
+    """Sorted row positions set in a packed bitmap."""
+    return np.flatnonzero(np.unpackbits(bitmap, count=row_count)).astype(np.int64)
+
+
+def build_ranks(values: pd.Series) -> np.ndarray:
+    """Sort permutation as a rank array: rank[row] = row's place in ascending order (blanks last)."""
+    values = values.reset_index(drop=True)
+    try:
+        order = values.sort_values(kind='mergesort', na_position='last').index.to_numpy()
+    except TypeError:
+        # Mixed types - compare as text
+        order = values.astype(str).sort_values(kind='mergesort').index.to_numpy()
+    ranks = np.empty(len(order), dtype=np.int32)
+    ranks[order] = np.arange(len(order), dtype=np.int32)
+    return ranks
+
+
+def top_k(positions: np.ndarray, k: int, ranks: np.ndarray) -> np.ndarray:
+    """The k positions with the lowest rank, in rank order (argpartition, then sort only k)."""
+    if len(positions) > k:
+        keep = np.argpartition(ranks[positions], k - 1)[:k] if k > 0 else EMPTY_POSITIONS
+        positions = positions[keep]
+    return positions[np.argsort(ranks[positions], kind='stable')]
+
+
+class SortIndex:
+    """Precomputed rank arrays for sortable columns."""
+
+    def __init__(self, data: pd.DataFrame, columns: Tuple[str, ...] = SORT_COLUMNS):
+        self.data = data
+        self.ranks: Dict[str, np.ndarray] = {
+            column: build_ranks(data[column]) for column in columns if column in data.columns
+        }
+
+    def get(self, column: str) -> Optional[np.ndarray]:
+        """Rank array for a column (built on first use for columns not preloaded)."""
+        ranks = self.ranks.get(column)
+        if ranks is None and column in self.data.columns:
+            ranks = build_ranks(self.data[column])
+            self.ranks[column] = ranks
+        return ranks
+
+
+def hash_rows(frame: pd.DataFrame) -> np.ndarray:
+    """64-bit content hash of every row (categorical and plain storage of a value hash alike)."""
+    columns = {
+        column: values.astype(object) if isinstance(values.dtype, pd.CategoricalDtype) else values
+        for column, values in frame.items()
+    }
+    return pd.util.hash_pandas_object(pd.DataFrame(columns), index=False).to_numpy()
+
+
+class RowDelta:
+    """
+    Row mapping from one dataset generation to the next.
+
+    source[new_pos] is the old position of a row carried over unchanged, or -1 for a row whose
+    content is new (inserted or updated). Carried rows keep their relative order, so remapped
+    position lists stay sorted.
+    """
+
+    def __init__(self, old_count: int, source: np.ndarray):
+        self.old_count = old_count
+        self.new_count = len(source)
+        self.source = source
+        carried = np.flatnonzero(source >= 0)
+        self.changed = np.flatnonzero(source < 0)
+        # Old position -> new position of carried rows, -1 for rows deleted or replaced
+        self.remap = np.full(old_count, -1, dtype=np.int64)
+        self.remap[source[carried]] = carried
+        self.stale = np.flatnonzero(self.remap < 0)
+        # Whether any carried row changes position (otherwise untouched postings are reused as is)
+        self.moved = bool((source[carried] != carried).any())
+
+    def take(self, old: np.ndarray, changed: Optional[np.ndarray] = None) -> np.ndarray:
+        """Per-row array of the next generation: carried rows from old, changed rows from changed."""
+        dtype = old.dtype if changed is None or not len(changed) else np.result_type(old, changed)
+        result = np.zeros(self.new_count, dtype=dtype)
+        carried = self.source >= 0
+        result[carried] = old[self.source[carried]]
+        if changed is not None:
+            result[self.changed] = changed
+        return result
+
+
+def diff_rows(old: pd.DataFrame, new: pd.DataFrame, key_column: str, old_hashes: np.ndarray,
+              new_hashes: np.ndarray) -> Tuple[RowDelta, np.ndarray, Dict[str, int]]:
+    """
+    Match a new extract against the current data by key and row hash (see hash_rows).
+
+    The next generation keeps surviving rows in their current order (updated rows in place)
+    and appends inserted rows in extract order.
+
+    Returns:
+        (delta, order, counts): order lists the new frame's rows in next-generation order;
+        counts has 'inserted', 'updated', 'deleted' and 'unchanged'
+
+    Raises:
+        ValueError: columns differ, or key_column is missing, blank or not unique
+    """
+    if list(new.columns) != list(old.columns):
+        raise ValueError("Columns differ from the loaded data")
+    if key_column not in old.columns:
+        raise ValueError(f"Key column '{key_column}' not found")
+    old_keys, new_keys = old[key_column], new[key_column]
+    if old_keys.isna().any() or new_keys.isna().any():
+        raise ValueError(f"Blank values in key column '{key_column}'")
+    old_keys = pd.Index(old_keys.astype(str))
+    new_keys = pd.Index(new_keys.astype(str))
+    if not old_keys.is_unique or not new_keys.is_unique:
+        raise ValueError(f"Key column '{key_column}' is not unique")
+
+    slots = new_keys.get_indexer(old_keys)  # Each current row's row in the new extract, -1 = deleted
+    kept = np.flatnonzero(slots >= 0)
+    matched = slots[kept]
+    inserted = np.setdiff1d(np.arange(len(new)), matched, assume_unique=True)
+    order = np.concatenate([matched, inserted]).astype(np.int64)
+
+    unchanged = old_hashes[kept] == new_hashes[matched]
+    source = np.full(len(order), -1, dtype=np.int64)
+    source[:len(kept)][unchanged] = kept[unchanged]
+    counts = {
+        'inserted': len(inserted),
+        'updated': int((~unchanged).sum()),
+        'deleted': len(old) - len(kept),
+        'unchanged': int(unchanged.sum()),
+    }
+    return RowDelta(len(old), source), order, counts
+
+
+class SearchIndexes:
+    """All indexes derived from one loaded dataset."""
+
+    def __init__(self, data: pd.DataFrame, description_column: str = 'Equipment Description'):
+        self.data = data
+        self.version = next(_DATA_VERSIONS)
+        self.row_count = len(data)
+        self.description_column = description_column
+        # Column storage report from compact_frame (set by the loader, None for frames assigned directly)
+        self.memory_report: Optional[pd.DataFrame] = None
+        self._row_hashes: Optional[np.ndarray] = None  # See row_hashes
+        self.tokens: Optional[TokenIndex] = None
+        self.descriptions: Optional[np.ndarray] = None
+        if description_column in data.columns:
+            values = data[description_column]
+            self.descriptions = values.to_numpy(dtype=object)
+            self.tokens = TokenIndex(values)
+        self.keys: Dict[str, KeyIndex] = {
+            column: KeyIndex(data[column]) for column in KEY_COLUMNS if column in data.columns
+        }
+        self.facets: Dict[str, FacetIndex] = {
+            column: FacetIndex(data[column]) for column in FACET_COLUMNS if column in data.columns
+        }
+        self.cube: Optional[FacetCube] = None
+        if all(column in data.columns for column in FACET_HIERARCHY):
+            self.cube = FacetCube(data)
+        self.tags: Optional[TagIndex] = TagIndex(data[TAG_COLUMN]) if TAG_COLUMN in data.columns else None
+        self.sort = SortIndex(data)
+
+    def apply_delta(self, data: pd.DataFrame, delta: RowDelta) -> 'SearchIndexes':
+        """
+        Indexes of the next generation (data, laid out as described by delta), derived from these.
+
+        Token, key and tag indexes are updated incrementally: only changed rows are tokenized
+        or parsed and the rest of their structure is carried over. Facet bitmaps, the facet
+        cube and the preloaded sort ranks are rebuilt - they are vectorized passes over the whole
+        column, done here so their cost is part of the ingest rather than the first search.
+        These indexes are not modified, so searches running against them are unaffected.
+        """
+        indexes = SearchIndexes.__new__(SearchIndexes)
+        indexes.data = data
+        indexes.version = next(_DATA_VERSIONS)
+        indexes.row_count = len(data)
+        indexes.description_column = description_column = self.description_column
+        indexes.memory_report = None
+        indexes._row_hashes = None
+        changed = delta.changed
+        indexes.tokens = None
+        indexes.descriptions = None
+        if description_column in data.columns:
+            values = data[description_column]
+            indexes.descriptions = values.to_numpy(dtype=object)
+            if self.tokens is not None:
+                indexes.tokens = self.tokens.apply_delta(delta, self.descriptions[delta.stale].tolist(),
+                                                         indexes.descriptions[changed].tolist())
+            else:
+                indexes.tokens = TokenIndex(values)
+        indexes.keys = {
+            column: (self.keys[column].apply_delta(delta, data[column].iloc[changed]) if column in self.keys
+                     else KeyIndex(data[column]))
+            for column in KEY_COLUMNS if column in data.columns
+        }
+        indexes.facets = {
+            column: FacetIndex(data[column]) for column in FACET_COLUMNS if column in data.columns
+        }
+        indexes.cube = None
+        if all(column in data.columns for column in FACET_HIERARCHY):
+            indexes.cube = FacetCube(data)
+        indexes.tags = None
+        if TAG_COLUMN in data.columns:
+            tag_values = data[TAG_COLUMN]
+            indexes.tags = (self.tags.apply_delta(delta, tag_values.iloc[changed]) if self.tags is not None
+                            else TagIndex(tag_values))
+        indexes.sort = SortIndex(data)
+        return indexes
+
+    def row_hashes(self) -> np.ndarray:
+        """Content hash of every row (hash_rows, computed once per generation)."""
+        if self._row_hashes is None:
+            self._row_hashes = hash_rows(self.data)
+        return self._row_hashes
+
+    def __setstate__(self, state):
+        # Unpickled (snapshot) indexes count as a new data version in this process
+        self.__dict__.update(state)
+        self.version = next(_DATA_VERSIONS)
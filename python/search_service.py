@@ -0,0 +1,287 @@
+"""
+Search Service - Python Version
+===============================
+Long-lived local HTTP/JSON service around EquipmentSearchEngine, so the dashboard, scripts
+and batch jobs query one warm index instead of each paying the pandas import, CSV parse
+and index build.
+
+Built on asyncio streams only (no web framework). Requests are handled on worker threads,
+so a long /search_many does not hold up other clients. Every request runs against the index
+set that was current when it started, so a concurrent reload never mixes data versions;
+POST /reload builds the new generation on a background thread and swaps it in atomically
+(EquipmentSearchEngine.reload) while queries keep being served.
+
+Endpoints (JSON in, JSON out):
+    GET  /health        rows, data version
+    GET  /stats         cache metrics
+    POST /reload        {"data_file": optional, default the file loaded last}
+    GET  /search?q=...  same as POST /search with query-string parameters (columns comma-separated,
+                        facet_counts true/false; facets only over POST)
+    POST /search        {"description", "valve", "tag", "max_results", "match_mode",
+                         "columns", "sort_by", "facets", "facet_counts", "offset", "limit"}
+    POST /search_many   {"queries": ["text" | ["text", "valve"], ...], ...search options}
+
+Run:  python search_service.py equipment.csv --port 8765
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from search_engine import EquipmentSearchEngine, SearchResult, _quiet
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+def _json_default(value: Any) -> Any:
+    """JSON encoding for NumPy / pandas scalars."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return str(value)
+
+
+def _flag(value: Any) -> bool:
+    """A JSON boolean, or its query-string spelling (true/false, 1/0, yes/no, on/off)."""
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ('true', '1', 'yes', 'on'):
+        return True
+    if text in ('false', '0', 'no', 'off', ''):
+        return False
+    raise ValueError(f"expected true or false, got {value!r}")
+
+
+def _query_params(query: str) -> Dict[str, Any]:
+    """/search parameters from a query string, converted to the types a JSON body carries."""
+    params: Dict[str, Any] = {key: values[-1] for key, values in urllib.parse.parse_qs(query).items()}
+    params['description'] = params.pop('q', params.get('description', ''))
+    if 'facets' in params:
+        raise ValueError("facets are not supported on GET /search; use POST")
+    if 'columns' in params:
+        params['columns'] = [column.strip() for column in params['columns'].split(',') if column.strip()]
+    if 'facet_counts' in params:
+        params['facet_counts'] = _flag(params['facet_counts'])
+    return params
+
+
+def result_to_json(result: SearchResult, offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+    """Serializable form of a SearchResult: rows [offset:offset+limit] as records plus totals."""
+    stop = None if limit is None else offset + limit
+    frame = result.to_frame(offset, stop)
+    frame = frame.astype(object).where(frame.notna(), None)
+    body = {
+        'count': len(result),
+        'truncated': result.truncated,
+        'offset': offset,
+        'rows': frame.to_dict('records'),
+    }
+    if result.facet_counts is not None:
+        body['facet_counts'] = result.facet_counts
+    return body
+
+
+class SearchService:
+    """asyncio HTTP/JSON front end for one EquipmentSearchEngine."""
+
+    def __init__(self, engine: EquipmentSearchEngine, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> Tuple[str, int]:
+        """Start listening (port 0 picks a free port); returns the bound address."""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        return self.host, self.port
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        print(f"Search service listening on http://{self.host}:{self.port}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection (HTTP/1.1 keep-alive)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'malformed request line'}, close=True)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {'error': 'request body too large'}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                close = (headers.get('connection', '').lower() == 'close'
+                         or (version == 'HTTP/1.0' and headers.get('connection', '').lower() != 'keep-alive'))
+                if method == 'POST' and urllib.parse.urlsplit(target).path == '/reload':
+                    status, payload = await self.reload(body)
+                else:
+                    status, payload = await asyncio.get_running_loop().run_in_executor(
+                        None, self.handle, method, target, body)
+                await self._respond(writer, status, payload, close)
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def reload(self, body: bytes = b'') -> Tuple[int, Dict[str, Any]]:
+        """Reload the data in the background, then swap it in; queries are served meanwhile."""
+        self.requests += 1
+        try:
+            params = json.loads(body.decode('utf-8') or '{}')
+            data_file = params.get('data_file') if isinstance(params, dict) else None
+            start = time.perf_counter()
+            indexes = await asyncio.wrap_future(self.engine.reload(data_file, background=True))
+        except (ValueError, OSError) as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': f'{type(e).__name__}: {e}'}
+        return 200, {'rows': indexes.row_count, 'data_version': indexes.version,
+                     'elapsed': time.perf_counter() - start}
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any], close: bool):
+        data = json.dumps(payload, default=_json_default).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + data)
+        await writer.drain()
+
+    def handle(self, method: str, target: str, body: bytes = b'') -> Tuple[int, Dict[str, Any]]:
+        """
+        Route one request; returns (HTTP status, JSON payload). Usable without a socket and
+        from several threads at once.
+        """
+        self.requests += 1
+        url = urllib.parse.urlsplit(target)
+        # Engine console messages (truncation, batch summaries) are reported in the JSON instead
+        with _quiet():
+            return self._route(method, url, body)
+
+    def _route(self, method: str, url: urllib.parse.SplitResult, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        try:
+            if method == 'GET' and url.path == '/search':
+                return 200, self._search(_query_params(url.query))
+            if method == 'GET' and url.path == '/health':
+                indexes = self.engine._indexes
+                return 200, {'status': 'ok', 'rows': indexes.row_count, 'data_version': indexes.version}
+            if method == 'GET' and url.path == '/stats':
+                return 200, {'requests': self.requests, 'caches': self.engine.cache_stats()}
+            if url.path in ('/search', '/search_many'):
+                if method != 'POST':
+                    return 405, {'error': f'{method} not allowed on {url.path}'}
+                params = json.loads(body.decode('utf-8') or '{}')
+                if not isinstance(params, dict):
+                    return 400, {'error': 'request body must be a JSON object'}
+                return 200, self._search(params) if url.path == '/search' else self._search_many(params)
+            return 404, {'error': f'unknown path {url.path}'}
+        except (ValueError, TypeError, KeyError) as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': f'{type(e).__name__}: {e}'}
+
+    @staticmethod
+    def _options(params: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'max_results': int(params.get('max_results', 1000)),
+            'match_mode': params.get('match_mode', 'all'),
+            'columns': params.get('columns'),
+            'sort_by': params.get('sort_by', 'Equipment Description'),
+            'facets': params.get('facets'),
+        }
+
+    def _search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        options = self._options(params)
+        result = self.engine.search(params.get('description', ''), params.get('valve', ''),
+                                    options['max_results'], options['match_mode'], False,
+                                    options['columns'], options['sort_by'], params.get('tag', ''),
+                                    options['facets'], _flag(params.get('facet_counts', False)))
+        limit = params.get('limit')
+        return result_to_json(result, int(params.get('offset', 0)), None if limit is None else int(limit))
+
+    def _search_many(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        queries = params['queries']
+        if not isinstance(queries, list):
+            raise ValueError("'queries' must be a list")
+        batch = self.engine.search_many([query if isinstance(query, str) else tuple(query) for query in queries],
+                                        **self._options(params))
+        return {
+            'unique': batch.unique,
+            'elapsed': batch.elapsed,
+            'throughput': batch.throughput,
+            'results': {str(position): result_to_json(result) for position, result in batch.items()},
+        }
+
+
+def query_service(path: str, payload: Optional[Dict[str, Any]] = None, host: str = DEFAULT_HOST,
+                  port: int = DEFAULT_PORT, timeout: float = 30.0) -> Dict[str, Any]:
+    """Client helper for scripts: GET path, or POST payload as JSON; returns the decoded reply."""
+    url = f'http://{host}:{port}{path}'
+    data = None if payload is None else json.dumps(payload, default=_json_default).encode('utf-8')
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read().decode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve equipment searches over local HTTP/JSON")
+    parser.add_argument('data_file', help='Equipment data CSV')
+    parser.add_argument('--mapping', '-m', help='Synonym mapping (tbl_Mapping export, CSV or JSON)')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'Listen address (default {DEFAULT_HOST})')
+    parser.add_argument('--port', '-p', type=int, default=DEFAULT_PORT, help=f'Port (default {DEFAULT_PORT})')
+    args = parser.parse_args()
+
+    engine = EquipmentSearchEngine(data_file=args.data_file, mapping_file=args.mapping)
+    service = SearchService(engine, args.host, args.port)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        print("Search service stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""
+Sharded Search - Python Version
+===============================
+Search across several equipment datasets (one per unit / plant, or one table split by
+Work Area), each indexed by its own EquipmentSearchEngine in a dedicated worker process.
+
+Queries are scattered to every shard at once, each shard returns its own sorted top-k,
+and the parent merges those sorted lists into the global top-k. Shards search in
+parallel on separate cores instead of sharing one interpreter.
+"""
+
+import contextlib
+import heapq
+import io
+import itertools
+import math
+import multiprocessing
+import pickle
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from search_engine import EquipmentSearchEngine, MATCH_MODES, TAG_SEARCH_MIN_LEN
+from search_synonyms import SynonymTable
+
+# Column used by ShardedSearchEngine.from_frame
+SHARD_COLUMN = 'Work Area'
+
+
+def _merge_key(value: Any) -> Tuple:
+    """Sort key for a sort-column value that orders blanks last (like the rank arrays)."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return (1, '')
+    return (0, value)
+
+
+def _shard_search(engine: EquipmentSearchEngine, query: Dict[str, Any]) -> Tuple[pd.DataFrame, List[Tuple], bool]:
+    """Top-k rows of one shard plus the keys the parent merges on."""
+    result = engine.search(query['description_search'], query['valve_search'], query['max_results'],
+                           query['match_mode'], False, query['columns'], query['sort_by'],
+                           query['tag_search'], query['facets'])
+    rows = result.to_frame()
+    if result.scores is not None:
+        keys = [(-score,) for score in result.scores.tolist()]
+    else:
+        tiers = [0] * len(result)
+        if len(query['tag_search'].strip()) >= TAG_SEARCH_MIN_LEN and engine._indexes.tags is not None:
+            tiers = engine.tag_ranks(query['tag_search'])[result.positions].tolist()
+        sort_by = query['sort_by']
+        if sort_by and sort_by in engine.data.columns:
+            values = engine.data[sort_by].iloc[result.positions].tolist()
+        else:
+            values = [None] * len(result)
+        keys = [(tier, _merge_key(value)) for tier, value in zip(tiers, values)]
+    return rows, keys, result.truncated
+
+
+def _shard_answer(engine: EquipmentSearchEngine, query: Dict[str, Any]) -> Any:
+    """_shard_search, or the exception it raised (sent back to the parent, the worker keeps serving)."""
+    try:
+        return _shard_search(engine, query)
+    except Exception as e:
+        try:
+            pickle.dumps(e)
+        except Exception:
+            e = RuntimeError(f'{type(e).__name__}: {e}')
+        return e
+
+
+def _shard_worker(conn, source: Optional[str], frame: Optional[pd.DataFrame],
+                  synonym_pairs: List[Tuple[str, str]]):
+    """Shard process: build (or map) the shard's indexes once, then answer query batches."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = EquipmentSearchEngine()
+        if source is not None:
+            engine.load_data(source)
+        else:
+            engine.data = frame
+    engine.synonyms = SynonymTable(synonym_pairs)
+    conn.send(len(engine.data))
+    while True:
+        batch = conn.recv()
+        if batch is None:
+            break
+        with contextlib.redirect_stdout(io.StringIO()):
+            conn.send([_shard_answer(engine, query) for query in batch])
+    conn.close()
+
+
+class ShardedSearchEngine:
+    """
+    Scatter/gather search over shards hosted in worker processes.
+
+    Use from_files() for one extract per unit/plant or from_frame() to split one table by a
+    column; close() (or a with block) stops the workers.
+    """
+
+    def __init__(self, shards: Dict[str, Tuple[Optional[str], Optional[pd.DataFrame]]],
+                 synonyms: Optional[SynonymTable] = None):
+        self.names = list(shards)
+        synonym_pairs = (synonyms or EquipmentSearchEngine().synonyms).pairs
+        context = multiprocessing.get_context()
+        self._connections = []
+        self._processes = []
+        for name, (source, frame) in shards.items():
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=_shard_worker, args=(child_conn, source, frame, synonym_pairs),
+                                      daemon=True, name=f'search-shard-{name}')
+            process.start()
+            child_conn.close()
+            self._connections.append(parent_conn)
+            self._processes.append(process)
+        self.row_counts = {name: conn.recv() for name, conn in zip(self.names, self._connections)}
+        print(f"Started {len(self.names)} search shards ({sum(self.row_counts.values())} records)")
+
+    @classmethod
+    def from_files(cls, file_paths: Iterable[str], synonyms: Optional[SynonymTable] = None) -> 'ShardedSearchEngine':
+        """One shard per data file (each worker loads its file, via the snapshot when current)."""
+        return cls({str(path): (str(path), None) for path in file_paths}, synonyms)
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, shard_by: str = SHARD_COLUMN,
+                   synonyms: Optional[SynonymTable] = None) -> 'ShardedSearchEngine':
+        """One shard per value of shard_by (blank values form their own shard)."""
+        groups = data.groupby(data[shard_by].astype(object).fillna(''), sort=True, observed=True)
+        return cls({str(value): (None, part) for value, part in groups}, synonyms)
+
+    def __enter__(self) -> 'ShardedSearchEngine':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Stop the shard processes."""
+        for conn in self._connections:
+            try:
+                conn.send(None)
+                conn.close()
+            except (OSError, ValueError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+        self._connections, self._processes = [], []
+
+    def search_equipment(self,
+                         description_search: str = "",
+                         valve_search: str = "",
+                         max_results: int = 1000,
+                         match_mode: str = 'all',
+                         columns: Optional[List[str]] = None,
+                         sort_by: Optional[str] = 'Equipment Description',
+                         tag_search: str = "",
+                         facets: Optional[Dict[str, Union[str, List[str]]]] = None) -> pd.DataFrame:
+        """
+        Search every shard and merge the results (arguments as in EquipmentSearchEngine.search_equipment).
+
+        Returns:
+            DataFrame indexed by (shard, row label within the shard)
+        """
+        frame, truncated = self._scatter([(description_search, valve_search)], max_results, match_mode,
+                                         columns, sort_by, tag_search, facets)[0]
+        if truncated:
+            print(f"Results limited to {max_results} records")
+        return frame
+
+    def search_many(self,
+                    queries: Iterable[Union[str, Tuple[str, str]]],
+                    max_results: int = 1000,
+                    match_mode: str = 'all',
+                    columns: Optional[List[str]] = None,
+                    sort_by: Optional[str] = 'Equipment Description',
+                    tag_search: str = "",
+                    facets: Optional[Dict[str, Union[str, List[str]]]] = None) -> List[pd.DataFrame]:
+        """
+        Run a batch of description strings or (description, valve) pairs; every shard works
+        through the whole batch in parallel. Results are in input order.
+        """
+        start = time.perf_counter()
+        results = [frame for frame, _ in self._scatter(queries, max_results, match_mode, columns,
+                                                       sort_by, tag_search, facets)]
+        elapsed = time.perf_counter() - start
+        print(f"Sharded batch: {len(results)} queries over {len(self.names)} shards in {elapsed:.2f}s "
+              f"- {len(results) / elapsed if elapsed > 0 else float('inf'):.0f} queries/s")
+        return results
+
+    def _scatter(self, queries: Iterable[Union[str, Tuple[str, str]]], max_results: int, match_mode: str,
+                 columns: Optional[List[str]], sort_by: Optional[str], tag_search: str,
+                 facets: Optional[Dict[str, Union[str, List[str]]]]) -> List[Tuple[pd.DataFrame, bool]]:
+        """Send the batch to every shard, gather the answers and merge them per query."""
+        # Reject bad options here rather than once per shard
+        if match_mode not in MATCH_MODES:
+            raise ValueError(f"Match mode '{match_mode}' not found.")
+        for column, selected in (facets or {}).items():
+            if not (isinstance(selected, str) or
+                    (isinstance(selected, (list, tuple)) and all(isinstance(value, str) for value in selected))):
+                raise TypeError(f"Facet '{column}' must be a value or a list of values")
+        batch = [
+            {'description_search': query if isinstance(query, str) else (query[0] or ''),
+             'valve_search': '' if isinstance(query, str) else (query[1] or ''),
+             'max_results': max_results, 'match_mode': match_mode, 'columns': columns,
+             'sort_by': sort_by, 'tag_search': tag_search, 'facets': facets}
+            for query in queries
+        ]
+        # Scatter the whole batch, then gather each shard's answers
+        for conn in self._connections:
+            conn.send(batch)
+        answers = [conn.recv() for conn in self._connections]
+        # A query that failed in a shard raises here as it would on a single engine
+        for shard_answers in answers:
+            for answer in shard_answers:
+                if isinstance(answer, BaseException):
+                    raise answer
+
+        return [self._merge([shard_answers[i] for shard_answers in answers], max_results)
+                for i in range(len(batch))]
+
+    def _merge(self, parts: List[Tuple[pd.DataFrame, List[Tuple], bool]],
+               max_results: int) -> Tuple[pd.DataFrame, bool]:
+        """
+        k-way merge of the shards' sorted top-k lists into the global top-k.
+
+        Rows with equal sort keys keep shard order. In ranked mode each shard scores with its
+        own BM25 statistics, so scores are comparable only approximately across shards.
+        """
+        def merged(as_text: bool):
+            streams = [
+                [(tuple(str(part) for part in key) if as_text else key, shard, row)
+                 for row, key in enumerate(keys)]
+                for shard, (_, keys, _) in enumerate(parts)
+            ]
+            return [(shard, row) for _, shard, row in itertools.islice(heapq.merge(*streams), max_results + 1)]
+
+        try:
+            picked = merged(False)
+        except TypeError:
+            picked = merged(True)  # Shards disagree on the sort column's type - compare as text
+        truncated = len(picked) > max_results or any(part_truncated for _, _, part_truncated in parts)
+        picked = picked[:max_results]
+
+        frames = [rows for rows, _, _ in parts]
+        combined = pd.concat(frames, keys=self.names, names=['Shard', None])
+        offsets = list(itertools.accumulate([0] + [len(frame) for frame in frames]))
+        return combined.iloc[[offsets[shard] + row for shard, row in picked]], truncated
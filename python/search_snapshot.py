@@ -0,0 +1,244 @@
+"""
+Search Snapshots - Python Version
+=================================
+On-disk binary snapshot of a loaded dataset and its search indexes, so a restart can
+memory-map the previous build instead of re-reading the CSV and rebuilding every index.
+
+A snapshot is one file next to the source (<source>.snapshot):
+
+    MAGIC | header length | JSON header | pickle stream | array buffer
+
+Every numeric/fixed-width NumPy array (data columns, posting lists, rank arrays, tag
+arrays, ...) is written to the array buffer and pickled only as a reference; on load the
+arrays are read-only views of the memory-mapped file. Everything else (text columns,
+vocabularies, dicts) goes through the pickle stream.
+
+The header records the source file's size, mtime and SHA-1 content hash, the pandas and
+NumPy versions that wrote it and the load options (e.g. compaction). A snapshot is used
+when versions and options match and size and mtime match, or only the mtime changed but the
+content hash still matches; otherwise the caller rebuilds it.
+
+The same format publishes in-memory indexes to worker processes: publish() writes them to a
+temporary (RAM-backed where available) file and workers attach() to it. The array data is
+then mapped once by the OS and shared by every worker instead of being copied into each.
+"""
+
+import hashlib
+import io
+import json
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from search_index import SearchIndexes
+
+MAGIC = b'SSNAP\x00\x00\x01'
+# Bump when the index classes change shape (older snapshots are then rebuilt)
+SNAPSHOT_FORMAT = 6
+_ALIGN = 64
+
+# Where publish() puts shared index files (/dev/shm is RAM-backed on Linux)
+PUBLISH_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+def snapshot_path(source: str) -> str:
+    """Default snapshot file for a source data file."""
+    return source + '.snapshot'
+
+
+def file_signature(source: str, with_hash: bool = True) -> Dict[str, Any]:
+    """Size, mtime and (optionally) SHA-1 content hash of a file."""
+    stat = os.stat(source)
+    signature = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha1()
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        signature['sha1'] = digest.hexdigest()
+    return signature
+
+
+class _ArrayPickler(pickle.Pickler):
+    """Pickler that moves NumPy array data into a side buffer."""
+
+    def __init__(self, file, arrays: List[Tuple[int, np.ndarray]]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.arrays = arrays
+        self.offset = 0
+
+    def persistent_id(self, obj):
+        if type(obj) is not np.ndarray or obj.dtype.hasobject or not obj.size:
+            return None
+        data = np.ascontiguousarray(obj)
+        self.offset = -(-self.offset // _ALIGN) * _ALIGN
+        ref = ('ndarray', self.offset, data.dtype.str, data.shape)
+        self.arrays.append((self.offset, data))
+        self.offset += data.nbytes
+        return ref
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    """Unpickler resolving array references to views of the mapped buffer."""
+
+    def __init__(self, file, buffer: memoryview):
+        super().__init__(file)
+        self.buffer = buffer
+
+    def persistent_load(self, pid):
+        _, offset, dtype, shape = pid
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        return np.frombuffer(self.buffer, dtype=dtype, count=count, offset=offset).reshape(shape)
+
+
+def read_header(path: str) -> Optional[Dict[str, Any]]:
+    """Snapshot header (plus 'data_offset'), or None when the file is missing or not a snapshot."""
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            (length,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(length).decode('utf-8'))
+            header['data_offset'] = len(MAGIC) + 8 + length
+            return header
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def _library_versions() -> Dict[str, str]:
+    return {'pandas': pd.__version__, 'numpy': np.__version__}
+
+
+def is_current(header: Optional[Dict[str, Any]], source: str, options: Optional[Dict[str, Any]] = None) -> bool:
+    """True when the snapshot header still describes the source file, loaded with options."""
+    if not header or header.get('format') != SNAPSHOT_FORMAT:
+        return False
+    if header.get('libraries') != _library_versions() or header.get('options', {}) != (options or {}):
+        return False
+    recorded = header.get('source', {})
+    current = file_signature(source, with_hash=False)
+    if recorded.get('size') != current['size']:
+        return False
+    if recorded.get('mtime_ns') == current['mtime_ns']:
+        return True
+    # Touched but maybe unchanged (copy, checkout) - fall back to the content hash
+    return recorded.get('sha1') == file_signature(source)['sha1']
+
+
+def write_snapshot(indexes: SearchIndexes, path: str, header: Optional[Dict[str, Any]] = None) -> str:
+    """Write indexes to path in the snapshot format (atomically replaces an existing file)."""
+    arrays: List[Tuple[int, np.ndarray]] = []
+    stream = io.BytesIO()
+    pickler = _ArrayPickler(stream, arrays)
+    pickler.dump(indexes)
+    payload = stream.getvalue()
+
+    header = dict(header or {})
+    header.update({
+        'format': SNAPSHOT_FORMAT,
+        'libraries': _library_versions(),
+        'rows': indexes.row_count,
+        'pickle_length': len(payload),
+        'array_bytes': pickler.offset,
+    })
+    header_bytes = json.dumps(header).encode('utf-8')
+    prefix = len(MAGIC) + 8 + len(header_bytes) + len(payload)
+    padding = -prefix % _ALIGN
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(header_bytes)))
+            f.write(header_bytes)
+            f.write(payload)
+            f.write(b'\0' * padding)
+            written = 0
+            for offset, data in arrays:
+                f.write(b'\0' * (offset - written))
+                f.write(data.tobytes())
+                written = offset + data.nbytes
+        # Fails on Windows while the old snapshot is still mapped by a live index generation
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return path
+
+
+def map_snapshot(path: str, header: Optional[Dict[str, Any]] = None) -> SearchIndexes:
+    """Memory-map a snapshot file; arrays are read-only views of the mapping."""
+    header = header or read_header(path)
+    if not header or header.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"Not a current search snapshot: {path}")
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    start = header['data_offset']
+    end = start + header['pickle_length']
+    arrays_start = end + (-end % _ALIGN)
+    buffer = view[arrays_start:arrays_start + header['array_bytes']]
+    return _ArrayUnpickler(io.BytesIO(view[start:end]), buffer).load()
+
+
+def save_snapshot(indexes: SearchIndexes, source: str, path: Optional[str] = None,
+                  signature: Optional[Dict[str, Any]] = None, options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Write indexes to a snapshot for source (atomically replaces any previous snapshot).
+
+    Args:
+        indexes: Indexes built from source
+        source: Source data file
+        path: Snapshot file (default snapshot_path(source))
+        signature: file_signature(source) taken before source was read (default: now)
+        options: Load options the indexes were built with (checked by load_snapshot)
+
+    Returns:
+        Snapshot file path
+    """
+    path = path or snapshot_path(source)
+    return write_snapshot(indexes, path, {'source': signature or file_signature(source), 'options': options or {}})
+
+
+def load_snapshot(source: str, path: Optional[str] = None,
+                  options: Optional[Dict[str, Any]] = None) -> Optional[SearchIndexes]:
+    """
+    Memory-map the snapshot for source, written with the same load options.
+
+    Returns:
+        SearchIndexes backed by the mapped file, or None when there is no current snapshot
+
+    Raises:
+        Whatever unpickling raises for a current-looking but damaged snapshot (e.g. truncated)
+    """
+    path = path or snapshot_path(source)
+    header = read_header(path)
+    if not is_current(header, source, options):
+        return None
+    return map_snapshot(path, header)
+
+
+def publish(indexes: SearchIndexes, directory: Optional[str] = None) -> str:
+    """
+    Write indexes to a temporary shared file for worker processes to attach() to.
+
+    The caller owns the file and removes it (os.remove) once the workers are done.
+    """
+    fd, path = tempfile.mkstemp(prefix='search-indexes-', suffix='.snapshot', dir=directory or PUBLISH_DIR)
+    os.close(fd)
+    return write_snapshot(indexes, path, {'published': indexes.version})
+
+
+def attach(path: str) -> SearchIndexes:
+    """Map indexes published by another process (zero-copy for all array data)."""
+    return map_snapshot(path)
@@ -0,0 +1,123 @@
+"""
+Synonym Table - Python Version
+==============================
+Python equivalent of the tbl_Mapping synonym table used by VBA BuildSynonymIndex.
+Terms linked by mapping rows are merged into groups (transitive closure), so expanding
+a search token is a single hash lookup.
+"""
+
+import csv
+import hashlib
+import json
+from typing import List, Dict, Iterable, Tuple
+
+# Bound on cached token expansions (typed tokens are unbounded, mapping terms are not)
+MAX_CACHED_EXPANSIONS = 10000
+
+# Used when no mapping file has been loaded (matches the original prototype mapping)
+DEFAULT_SYNONYM_MAPPING = [
+    {"RawTerm": "pump", "StandardTerm": "pumping equipment"},
+    {"RawTerm": "motor", "StandardTerm": "electric motor"},
+    {"RawTerm": "valve", "StandardTerm": "control valve"}
+]
+
+
+class SynonymTable:
+    """term -> synonym group hash map with cached per-token expansions."""
+
+    def __init__(self, pairs: Iterable[Tuple[str, str]] = ()):
+        parent: Dict[str, str] = {}
+
+        def find(term: str) -> str:
+            root = term
+            while parent[root] != root:
+                root = parent[root]
+            while parent[term] != root:
+                parent[term], term = root, parent[term]
+            return root
+
+        self.pairs: List[Tuple[str, str]] = []
+        for raw, standard in pairs:
+            raw = (raw or '').strip().lower()
+            standard = (standard or '').strip().lower() or raw  # VBA: blank StandardTerm maps to itself
+            if not raw:
+                continue
+            self.pairs.append((raw, standard))
+            for term in (raw, standard):
+                parent.setdefault(term, term)
+            root_raw, root_std = find(raw), find(standard)
+            if root_raw != root_std:
+                parent[root_raw] = root_std
+
+        # Precomputed closure: every term points at its full (sorted) group
+        groups: Dict[str, List[str]] = {}
+        for term in parent:
+            groups.setdefault(find(term), []).append(term)
+        self.groups: Dict[str, Tuple[str, ...]] = {}
+        for members in groups.values():
+            group = tuple(sorted(members))
+            for term in group:
+                self.groups[term] = group
+
+        digest = hashlib.sha1(json.dumps(sorted(set(self.pairs))).encode('utf-8'))
+        self.version = digest.hexdigest()[:12]
+        self._expansions: Dict[str, List[str]] = {}
+
+    @classmethod
+    def from_rows(cls, mapping_data: List[Dict[str, str]]) -> 'SynonymTable':
+        """Build from RawTerm/StandardTerm rows (same shape as build_synonym_index input)."""
+        return cls((row.get('RawTerm', ''), row.get('StandardTerm', '')) for row in mapping_data)
+
+    @classmethod
+    def from_index(cls, synonym_index: Dict[str, List[str]]) -> 'SynonymTable':
+        """Build from a legacy {StandardTerm: [RawTerm, ...]} index."""
+        return cls((raw, standard) for standard, raws in synonym_index.items() for raw in raws)
+
+    @classmethod
+    def from_file(cls, file_path: str) -> 'SynonymTable':
+        """
+        Load a mapping table export (CSV or JSON).
+
+        CSV files have a header row; RawTerm/StandardTerm columns are used when present,
+        otherwise the first two columns (like tbl_Mapping). JSON files hold a list of
+        RawTerm/StandardTerm objects.
+        """
+        if file_path.lower().endswith('.json'):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return cls.from_rows(json.load(f))
+
+        with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.reader(f))
+        if not rows:
+            return cls()
+        header = [cell.strip().lower() for cell in rows[0]]
+        raw_col = header.index('rawterm') if 'rawterm' in header else 0
+        std_col = header.index('standardterm') if 'standardterm' in header else 1
+        return cls(
+            (row[raw_col] if len(row) > raw_col else '', row[std_col] if len(row) > std_col else '')
+            for row in rows[1:]
+        )
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def group(self, term: str) -> Tuple[str, ...]:
+        """All terms synonymous with term (empty when it has no mapping)."""
+        return self.groups.get(term.strip().lower(), ())
+
+    def expand(self, token: str) -> List[str]:
+        """Token followed by its synonyms; cached per token."""
+        cached = self._expansions.get(token)
+        if cached is None:
+            cached = [token] + [term for term in self.groups.get(token, ()) if term != token]
+            if len(self._expansions) >= MAX_CACHED_EXPANSIONS:
+                self._expansions.clear()
+            self._expansions[token] = cached
+        return cached
+
+    def to_index(self) -> Dict[str, List[str]]:
+        """Legacy {StandardTerm: [RawTerm, ...]} view."""
+        index: Dict[str, Dict[str, None]] = {}
+        for raw, standard in self.pairs:
+            index.setdefault(standard, {})[raw] = None
+        return {standard: list(raws) for standard, raws in index.items()}
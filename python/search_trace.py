@@ -0,0 +1,127 @@
+"""
+Search Tracing - Python Version
+===============================
+Per-query instrumentation for EquipmentSearchEngine: monotonic timings for each stage of a
+search (synonym expansion, fuzzy expansion, regex compilation, filters, sorting,
+materialization), row counts in and out of each filter, cache hits and the chosen plan.
+
+Tracing is off unless engine.enable_tracing() is called; a disabled engine only tests
+`trace is not None` at each stage. Traces can be written as JSON lines and aggregated into
+per-stage percentiles with stage_percentiles().
+"""
+
+import json
+import time
+from collections import deque
+from typing import Any, Dict, IO, Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+
+
+class SearchTrace:
+    """Timings and counters of one search."""
+
+    __slots__ = ('operation', 'query', 'data_version', 'stages', 'rows', 'cache', 'plan', 'strategy',
+                 'returned', 'total', '_started', '_mark')
+
+    def __init__(self, operation: str, query: Dict[str, Any], data_version: Optional[int] = None):
+        self.operation = operation
+        self.query = query
+        self.data_version = data_version
+        self.stages: Dict[str, float] = {}  # Seconds per stage, in first-seen order
+        self.rows: Dict[str, Tuple[int, int]] = {}  # Rows in and out of each filter stage
+        self.cache: Dict[str, bool] = {}  # Cache name -> hit
+        self.plan: Optional[List[Dict[str, Any]]] = None  # QueryPlan.describe()
+        self.strategy: Optional[str] = None  # How the description filter ran
+        self.returned: Optional[int] = None
+        self.total: Optional[float] = None
+        self._started = self._mark = time.perf_counter()
+
+    def mark(self, stage: str, rows_in: Optional[int] = None, rows_out: Optional[int] = None):
+        """End a stage: the time since the previous mark is added to it."""
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._mark)
+        self._mark = now
+        if rows_in is not None:
+            self.rows[stage] = (rows_in, rows_out)
+
+    def finish(self, returned: Optional[int] = None):
+        self.total = time.perf_counter() - self._started
+        self.returned = returned
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form (times in milliseconds)."""
+        return {
+            'operation': self.operation,
+            'query': self.query,
+            'data_version': self.data_version,
+            'total_ms': None if self.total is None else self.total * 1000.0,
+            'stages_ms': {stage: seconds * 1000.0 for stage, seconds in self.stages.items()},
+            'rows': {stage: {'in': rows_in, 'out': rows_out} for stage, (rows_in, rows_out) in self.rows.items()},
+            'cache': self.cache,
+            'strategy': self.strategy,
+            'plan': self.plan,
+            'returned': self.returned,
+        }
+
+
+class Tracer:
+    """
+    Collects finished SearchTraces (the last `keep`) and optionally writes each one as a JSON
+    line to output (a file path, opened for append, or a text stream).
+    """
+
+    def __init__(self, output: Union[str, IO[str], None] = None, keep: int = 1000):
+        self.traces: deque = deque(maxlen=keep)
+        self._owns_stream = isinstance(output, str)
+        self._stream: Optional[IO[str]] = open(output, 'a', encoding='utf-8') if self._owns_stream else output
+
+    def start(self, operation: str, query: Dict[str, Any]) -> SearchTrace:
+        return SearchTrace(operation, query)
+
+    def finish(self, trace: SearchTrace, returned: Optional[int] = None):
+        trace.finish(returned)
+        self.traces.append(trace)
+        if self._stream is not None:
+            self._stream.write(json.dumps(trace.to_dict(), default=str) + '\n')
+            self._stream.flush()
+
+    def close(self):
+        if self._owns_stream and self._stream is not None:
+            self._stream.close()
+        self._stream = None
+
+    def summary(self, percentiles: Tuple[float, ...] = (0.5, 0.95, 0.99)) -> pd.DataFrame:
+        """Per-stage percentiles of the kept traces (see stage_percentiles)."""
+        return stage_percentiles((trace.to_dict() for trace in self.traces), percentiles)
+
+
+def load_traces(path: str) -> List[Dict[str, Any]]:
+    """Traces written by a Tracer to a JSON-lines file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def stage_percentiles(traces: Iterable[Dict[str, Any]],
+                      percentiles: Tuple[float, ...] = (0.5, 0.95, 0.99)) -> pd.DataFrame:
+    """
+    Milliseconds per stage at the given percentiles, plus how many traces ran the stage.
+
+    Returns:
+        DataFrame indexed by stage ('total' last) with columns count, p50, p95, p99, ...
+    """
+    samples: Dict[str, List[float]] = {}
+    for trace in traces:
+        for stage, ms in trace['stages_ms'].items():
+            samples.setdefault(stage, []).append(ms)
+        if trace.get('total_ms') is not None:
+            samples.setdefault('total', []).append(trace['total_ms'])
+    if 'total' in samples:
+        samples['total'] = samples.pop('total')
+    rows = {}
+    for stage, values in samples.items():
+        series = pd.Series(values)
+        row = {'count': len(values)}
+        row.update({f'p{round(q * 100):d}': series.quantile(q) for q in percentiles})
+        rows[stage] = row
+    return pd.DataFrame.from_dict(rows, orient='index')